@@ -1,9 +1,11 @@
 from datetime import datetime, timedelta
-from PIL import Image, ImageEnhance
+from PIL import Image
 from locale import normalize
 from pathlib import Path
 import numpy as np
 import requests
+import enhance
+import indices
 import piexif
 import csv
 import cv2
@@ -23,6 +25,9 @@ picName = "image_0.jpg" # path to the AstroPi image
 logName = "log.txt" # path to the log file from the ISS
 dataName = "data.csv" # path to the CSV data file from the ISS
 
+# table of the normalised differences (NDVI, NDWI), with a small value added to the denominator to prevent division by zero
+indexTable = indices.indexTable(1e-6)
+
 # csv file header
 csvheader = [
     "Date[YYYY-MM-DD]",
@@ -372,33 +377,15 @@ def setTimeLocation(fileName, time, lat, lon):
     img.save(fileName, exif = exifBytes)
 
 def calcNdvi(img):
-    # convert the image to a float array
-    imgf = img.astype('float32')
-    # extract the channels
-    red = imgf[:, :, 2]
-    nir = imgf[:, :, 0]
-    # calculate the NDVI array: NDVI = (NIR - RED) / (NIR + RED)
-    num = nir - red
-    den = nir + red
-    epsilon = 1e-6 # a small value to prevent division by zero
-    den += epsilon
-    ndvi = np.where(den <= epsilon, 0, num / den) # avoid dividing by zero
+    # read the NDVI array from the table, without converting the image to float: NDVI = (NIR - RED) / (NIR + RED)
+    ndvi = indices.ndvi(img, indexTable)
     # normalise the values to the byte 0-255 range
     ndvi = cv2.normalize(ndvi, None, 0, 255, cv2.NORM_MINMAX, dtype = cv2.CV_8UC1)
     return ndvi
 
 def calcNdwi(img):
-    # convert the image to a float array
-    imgf = img.astype('float32')
-    # extract the channels
-    green = imgf[:, :, 1]
-    nir = imgf[:, :, 0]
-    # calculate the NDWI array: NDWI = (GREEN - NIR) / (GREEN + NIR)
-    num = green - nir
-    den = green + nir
-    epsilon = 1e-6 # a small value to prevent division by zero
-    den += epsilon
-    ndwi = np.where(den <= epsilon, 0, num / den) # avoid dividing by zero
+    # read the NDWI array from the table, without converting the image to float: NDWI = (GREEN - NIR) / (GREEN + NIR)
+    ndwi = indices.ndwi(img, indexTable)
     # normalise the values to the byte 0-255 range
     ndwi = cv2.normalize(ndwi, None, 0, 255, cv2.NORM_MINMAX, dtype = cv2.CV_8UC1)
     return ndwi
@@ -425,15 +412,9 @@ def mask(img, msk):
     return img
 
 def contrast(image, factor = 2.5):
-    # convert the image from cv2 to PIL
-    pilImg = Image.fromarray(image)
-    # create enhancer object
-    enhancer = ImageEnhance.Contrast(pilImg)
-    # increase the contrast
-    enhancedImg = enhancer.enhance(factor)
-    # convert back to numpy array
-    enhanced = np.array(enhancedImg)
-    return enhanced
+    # increase the contrast exactly like PIL's ImageEnhance.Contrast, with a lookup table instead of converting the image to PIL and back
+    # the channels are in the same order that PIL would assume for the array (RGB)
+    return enhance.contrast(image, factor, rgb = True)
 
 def removeSea(msk):
     # find the connected components
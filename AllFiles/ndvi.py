@@ -1,9 +1,13 @@
 import cv2
 import numpy as np
+import indices
 from PIL import Image, ImageEnhance
 import os
 from datetime import datetime, timedelta
 
+#table of the index values in range [0;255] (8-bit fixed point)
+byteTable = indices.byteTable()
+
 def contrast(im): #increase contrast, sharpness, brightness
     
     # convert cv2 image to PIl image
@@ -28,27 +32,11 @@ def contrast(im): #increase contrast, sharpness, brightness
 def createNdviImage(im): #returns NDVI greyscale image
        
     
-    #separate channels blue, green, red from image and store them into different arrays
-    b, g, r = cv2.split(im)
-    
-    #adjust data type to float
-    b = b.astype(float)
-    g = g.astype(float)
-    r = r.astype(float)
-    
-    
-    #calculate ndvi value for each pixel
+    #read the ndvi value of each pixel from the table in indices.py, without converting the channels to float
     #blue channel contains infrared value
     #now much the difference between IR and VIS is big compared to the value of total light
-    #calculate denominator separately to check its value and fix it different from zero
-    denominator = b + r
-    denominator[denominator==0] = 0.01 
-    ndvi = (b - r)/denominator
-    
-    #ndvi values are currently in range [0;1] but we need them in range [0;255] to build the image
-    ndvi = ndvi * 255
-    #ndvi values are currently float but we need integers
-    ndvi = ndvi.astype(np.uint8)
+    #the table already contains the values multiplied by 255 and converted to integers, which are needed to build the image
+    ndvi = indices.ndvi(im, byteTable)
   
     #image must have separate values for B, G, R in each pixel to be handled by contrast()    
     ndvi_bgr_format = cv2.merge([ndvi,ndvi,ndvi])
@@ -1,9 +1,13 @@
 import cv2
 import numpy as np
+import indices
 from PIL import Image, ImageEnhance
 import os
 from datetime import datetime, timedelta
 
+#table of the index values in range [0;255] (8-bit fixed point)
+byteTable = indices.byteTable()
+
 prev_time = datetime.now()
 
 def contrast(im): #increase contrast, sharpness, brightness
@@ -30,26 +34,12 @@ def contrast(im): #increase contrast, sharpness, brightness
 def createNdwiImage(im): #returns NDWI grayscale image
        
     
-    #separate channels blue, green, red from image and store them into different arrays
-    b, g, r = cv2.split(im)
-    
-    #adjust data type to float
-    b = b.astype(float)
-    g = g.astype(float)
-    r = r.astype(float)
-    
-    
-    #calculate ndwi value for each pixel
+    #read the ndwi value of each pixel from the table in indices.py, without converting the channels to float
     #blue channel contains infrared value
     #now much the difference between green and IR is big compared to the value of the total light
-    denominator = b + g
-    denominator[denominator==0] = 0.01 #calculate denominator separately to check its value and adjust it in case it is zero
-    ndwi = (g - b)/denominator
-    
-    #values are currently in range [0;1] but we need them in range [0;255] to build the image
-    ndwi = ndwi * 255
-    #values are currently float but we need integers
-    ndwi = ndwi.astype(np.uint8)
+    #the table already contains the values multiplied by 255 and converted to integers, which are needed to build the image
+    ndwi = indices.ndwi(im, byteTable)
+  
     #image must have separate values for B, G, R in each pixel to be handled by contrast()    
     
     ndwi_bgr_format = cv2.merge([ndwi,ndwi,ndwi])
@@ -0,0 +1,166 @@
+from pathlib import Path
+from time import monotonic
+import csv
+import math
+import numpy as np
+import cv2
+import jpeg
+from sensors import channels
+from telemetry import senseHeader
+
+# replacements of the hardware of the Astro Pi, so that the main loop can run on any computer
+# main.py uses the camera, the SenseHat and the orbit of the ISS only through the objects returned by openCamera(), openSense() and
+# openOrbit(): without arguments they are the real PiCamera, SenseHat and orbit library (imported only then, so this file can be
+# imported anywhere), otherwise:
+# - ImageDirectoryCamera "takes" the pictures of a folder one after the other, as JPEG files with the EXIF data set in exif_tags
+# - SenseReplay returns the values of the rows of a data.csv, or synthetic values
+# - the orbit of the ISS is computed by skyfield from a TLE file
+# example: python main.py --images ../Pictures --sense synthetic --tle iss.tle --ephemeris de421.bsp
+
+# extensions of the pictures read by ImageDirectoryCamera
+pictureExtensions = [".jpg", ".jpeg", ".png"]
+
+class ImageDirectoryCamera:
+    # replacement of the PiCamera that takes the pictures of 'folder' in alphabetical order (and starts again after the last one)
+    # the JPEG files are used as they are, with the EXIF data of exif_tags added; the other pictures are compressed with the quality that is asked
+    # if 'matchResolution' is True, every picture is resized to the resolution of the camera (for example to time the loop with the
+    # pictures of the real size), and therefore compressed again
+
+    def __init__(self, folder, matchResolution = False):
+        self.paths = sorted(path for path in Path(folder).iterdir() if (path.suffix.lower() in pictureExtensions))
+        if (len(self.paths) == 0):
+            raise ValueError("No pictures in " + str(folder))
+        self.matchResolution = matchResolution
+        self.resolution = None
+        self.framerate = None
+        self.exif_tags = {}
+        self.count = 0 # number of pictures taken
+
+    def capture(self, output, format = "jpeg", quality = 85):
+        # writes the next picture to the stream 'output' as a JPEG file
+        if (format != "jpeg"):
+            raise ValueError("Only the JPEG format is supported")
+        path = self.paths[self.count % len(self.paths)]
+        self.count += 1
+
+        data = path.read_bytes()
+        if ((path.suffix.lower() not in [".jpg", ".jpeg"]) or (self.matchResolution and (self.resolution is not None))):
+            image = cv2.imdecode(np.frombuffer(data, dtype = np.uint8), cv2.IMREAD_COLOR)
+            if (image is None):
+                raise ValueError("Unable to read " + str(path))
+            if (self.matchResolution and (self.resolution is not None)):
+                image = cv2.resize(image, tuple(self.resolution), interpolation = cv2.INTER_LINEAR)
+            data = jpeg.encode(image, None, quality)
+
+        # add the location set in exif_tags, like the PiCamera
+        gps = [self.exif_tags.get("GPS.GPS" + tag) for tag in ["Altitude", "Latitude", "LatitudeRef", "Longitude", "LongitudeRef"]]
+        if (None not in gps):
+            data = jpeg.insertExif(data, jpeg.gpsExif(*gps))
+        output.write(data)
+
+    def close(self):
+        pass
+
+def readRecording(path):
+    # returns the values of the SenseHat in the CSV file 'path' (a data.csv written by main.py), as an array with one row for every row
+    # of the file and one column for every value in the order of 'channels' (NaN for the values that are missing, "-" in the file)
+    with open(path, "r", encoding = "utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader)
+        columns = [header.index(name) for name in senseHeader]
+        rows = []
+        for line in reader:
+            if (len(line) < len(header)):
+                continue
+            rows.append([(float(line[i]) if (line[i] not in ["", "-"]) else np.nan) for i in columns])
+    return np.array(rows, dtype = np.float64).reshape(-1, len(channels))
+
+class SenseReplay:
+    # replacement of the SenseHat that returns the values of 'rows' (see readRecording()), one row every 'period' seconds of 'clock'
+    # (the rows of data.csv were written every 3 seconds), starting again after the last one
+    # without rows, it returns synthetic values: the ISS turns once per orbit (yaw and magnetic field), with some noise
+    # a value that is missing in the row raises an exception, like a sensor that cannot be read
+
+    def __init__(self, rows = None, period = 3, clock = monotonic, seed = 0):
+        self.rows = rows
+        self.period = period
+        self.clock = clock
+        self.start = clock()
+        self.random = np.random.default_rng(seed)
+
+    def values(self):
+        # returns the values of the SenseHat now, in the order of 'channels'
+        elapsed = self.clock() - self.start
+        if ((self.rows is not None) and (len(self.rows) > 0)):
+            return self.rows[int(elapsed / self.period) % len(self.rows)]
+        phase = 2 * math.pi * elapsed / 5560 # one orbit every 92.7 minutes
+        noise = self.random.normal(0, 1, len(channels))
+        return np.array([
+            math.degrees(phase) % 360, 1 + noise[1] * 0.1, 359 + noise[2] * 0.1, # yaw, pitch, roll [Deg]
+            noise[3] * 0.002, noise[4] * 0.002, noise[5] * 0.002, # acceleration [g]
+            30 * math.cos(phase), 30 * math.sin(phase), -20 + noise[8], # magnetic field [µT]
+            noise[9] * 0.001, noise[10] * 0.001, noise[11] * 0.001, # angular velocity [rad/s]
+            27 + 0.5 * math.sin(phase) + noise[12] * 0.05, 1000 + noise[13] * 0.1, 45 + noise[14] * 0.2 # temperature [°C], pressure [hPa], humidity [%]
+        ])
+
+    def read(self, first, keys = None):
+        # returns the value number 'first' (or a dictionary of the values from 'first' with the names 'keys'), like the SenseHat
+        values = self.values()
+        count = 1 if (keys is None) else len(keys)
+        if (np.isnan(values[first:first + count]).any()):
+            raise ValueError("Value missing in the recording")
+        if (keys is None):
+            return float(values[first])
+        return {key: float(value) for key, value in zip(keys, values[first:first + count])}
+
+    def get_orientation(self):
+        return self.read(0, ["yaw", "pitch", "roll"])
+
+    def get_accelerometer_raw(self):
+        return self.read(3, ["x", "y", "z"])
+
+    def get_compass_raw(self):
+        return self.read(6, ["x", "y", "z"])
+
+    def get_gyroscope_raw(self):
+        return self.read(9, ["x", "y", "z"])
+
+    def get_temperature(self):
+        return self.read(12)
+
+    def get_pressure(self):
+        return self.read(13)
+
+    def get_humidity(self):
+        return self.read(14)
+
+def loadTLE(path, timescale):
+    # returns the satellite (a skyfield EarthSatellite, like orbit.ISS) of the TLE in the file 'path'
+    # (the two lines of the elements, optionally after the name of the satellite)
+    from skyfield.api import EarthSatellite
+    with open(path, "r", encoding = "utf-8") as tlefile:
+        lines = [line.strip() for line in tlefile if (line.strip() != "")]
+    return EarthSatellite(lines[-2], lines[-1], "ISS", timescale)
+
+def openCamera(images = None, matchResolution = False):
+    # returns the PiCamera, or an ImageDirectoryCamera of the folder 'images' if it is given
+    if (images is None):
+        from picamera import PiCamera
+        return PiCamera()
+    return ImageDirectoryCamera(images, matchResolution)
+
+def openSense(recording = None, clock = monotonic):
+    # returns the SenseHat, or a SenseReplay of the CSV file 'recording' if it is given ("synthetic" for the synthetic values)
+    if (recording is None):
+        from sense_hat import SenseHat
+        return SenseHat()
+    return SenseReplay(None if (recording == "synthetic") else readRecording(recording), clock = clock)
+
+def openOrbit(tle = None, ephemeris = "de421.bsp"):
+    # returns the ISS and the ephemeris of the orbit library, or the satellite of the TLE file 'tle' and the ephemeris file 'ephemeris'
+    # if the TLE is given (skyfield downloads the ephemeris if the file does not exist)
+    if (tle is None):
+        from orbit import ISS, ephemeris as orbitEphemeris
+        return ISS, orbitEphemeris
+    from skyfield.api import load
+    return loadTLE(tle, load.timescale()), load(ephemeris)
@@ -0,0 +1,134 @@
+from pathlib import Path
+from time import perf_counter
+import tracemalloc
+import os
+import gc
+import numpy as np
+import cv2
+from vision import segmentation, evaluate, relevanceGate, WindowTracker, SegmentationWorkspace
+from parallel import ParallelSegmentation
+
+# benchmark of the analysis of the pictures, run on the pictures in the repository
+# it replays the same steps as main.py (window tracker, thumbnail gate, segmentation and score) many times,
+# and checks that the memory used by Python does not grow once the workspaces have been allocated, and that the segmentation of a
+# picture does not allocate any image (the assertions fail otherwise)
+# then it compares the time of the segmentation in the main process with the parallel segmentation
+
+frames = 1000 # number of pictures analysed (a multiple of the number of pictures)
+size = (1014, 760) # size of the scaled pictures in main.py (1/4 of 4056x3040)
+processes = 4 # number of processes of the parallel segmentation
+# tolerances of the checks of the memory: a few Python objects (the counters of the histograms, the score...), but no image
+# (a scaled picture is 2.3MB, one of its single channel images 770KB)
+growthTolerance = 4096 # bytes that the memory can grow during the whole benchmark, after the first round of pictures
+peakTolerance = 256 * 1024 # bytes that can be allocated at the same time while a picture is analysed (without detecting the window)
+
+def loadPictures():
+    # load the pictures of the Earth in the repository, scaled to the size used in main.py
+    picsFolder = Path(__file__).parent.resolve().parent / "Pictures"
+    names = ["originalImage.png", "SouthCarolinaISS.jpg", "scaledImage.png", "croppedImage2.jpg", "contrasted.jpg"]
+    pictures = []
+    for name in names:
+        im = cv2.imread(str(picsFolder / name))
+        if (im is not None):
+            pictures.append(cv2.resize(im, size, interpolation = cv2.INTER_AREA))
+    return pictures
+
+def analyse(im, window, workspace, gateWorkspace):
+    # same analysis as in main.py
+    window.update(im)
+    relevant, score, clouds = relevanceGate(im, window, workspace = gateWorkspace)
+    if (relevant):
+        score = evaluate(segmentation(im, window, workspace))
+    return score
+
+def analysisPeak(pictures, window, workspace, gateWorkspace):
+    # returns the highest memory allocated at the same time while analysing a picture, once the window tracker has been updated with it
+    # (the window tracker detects the window again when the brightness changes, which allocates its masks: in the benchmark the
+    # pictures change every time, on the ISS it happens only every 100 pictures)
+    peak = 0
+    tracemalloc.start()
+    for im in pictures:
+        analyse(im, window, workspace, gateWorkspace)
+        gc.collect()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        relevanceGate(im, window, workspace = gateWorkspace)
+        evaluate(segmentation(im, window, workspace))
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return peak
+
+def compareParallel(pictures, scale, repetitions):
+    # times the serial and the parallel segmentation of the pictures resized by 'scale' (each one 'repetitions' times),
+    # and checks that they give the same label map
+    pictures = [cv2.resize(im, None, fx = scale, fy = scale) for im in pictures]
+    window = WindowTracker()
+    window.update(pictures[0])
+    workspace = SegmentationWorkspace()
+    parallelSegmentation = ParallelSegmentation(processes)
+
+    serialTime, parallelTime = 0, 0
+    differences = 0
+    for im in pictures:
+        # the first segmentation allocates the images and the shared memory, so it is not timed
+        labels = segmentation(im, window, workspace).copy()
+        differences += int(not np.array_equal(parallelSegmentation.segmentation(im, window), labels))
+
+        start = perf_counter()
+        for i in range(repetitions):
+            segmentation(im, window, workspace)
+        serialTime += perf_counter() - start
+        start = perf_counter()
+        for i in range(repetitions):
+            parallelSegmentation.segmentation(im, window)
+        parallelTime += perf_counter() - start
+    parallelSegmentation.close()
+
+    count = len(pictures) * repetitions
+    height, width = pictures[0].shape[:2]
+    print("Segmentation " + str(width) + "x" + str(height) + ": serial " + str(round(serialTime / count * 1000, 2)) + " ms, "
+          + str(processes) + " processes " + str(round(parallelTime / count * 1000, 2)) + " ms, speedup " + str(round(serialTime / parallelTime, 2))
+          + "x, differences: " + str(differences))
+
+def main():
+    pictures = loadPictures()
+    window = WindowTracker()
+    workspace = SegmentationWorkspace()
+    gateWorkspace = SegmentationWorkspace()
+
+    # warm up: allocate the workspaces and the mask of the window
+    for im in pictures:
+        analyse(im, window, workspace, gateWorkspace)
+
+    tracemalloc.start()
+    start = perf_counter()
+    for i in range(frames):
+        # take the snapshot after the first round of pictures, so that only the steady state is measured
+        # (the tracker keeps the mask of the last picture, so the memory is compared after the same picture)
+        # the garbage collector is run before both measurements, so that only the memory that is really kept is counted
+        if (i == len(pictures)):
+            gc.collect()
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        analyse(pictures[i % len(pictures)], window, workspace, gateWorkspace)
+    elapsed = perf_counter() - start
+    gc.collect()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("Pictures analysed: " + str(frames))
+    print("Time per picture: " + str(round(elapsed / frames * 1000, 2)) + " ms")
+    print("Memory growth: " + str(after - before) + " B (peak: " + str(peak - before) + " B, with the detection of the window)")
+    analysis = analysisPeak(pictures, window, workspace, gateWorkspace)
+    print("Memory allocated while analysing a picture: " + str(analysis) + " B")
+    # no memory is kept between the pictures, and no image is allocated by the analysis
+    assert (after - before) <= growthTolerance, "the memory grows by " + str(after - before) + " B"
+    assert analysis <= peakTolerance, "the analysis allocates " + str(analysis) + " B"
+
+    # serial and parallel segmentation, on the scaled pictures and at full resolution
+    print("CPU cores: " + str(os.cpu_count()))
+    compareParallel(pictures, 1, 20)
+    compareParallel(pictures, 4, 2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from io import BytesIO
+from contextlib import nullcontext
+import numpy as np
+import cv2
+import jpeg
+
+# capture of the pictures into memory
+# the camera writes the JPEG file (with its EXIF data) into a stream in memory instead of a temporary file on the SD card,
+# the picture is decoded once from there and the EXIF data is kept as bytes, so only the final cropped picture is written to the disk
+
+class MemoryCapture:
+    # takes the pictures of 'camera' (a PiCamera) into memory, as JPEG files with the given quality
+    # if 'timings' (a timing.Timings) is given, the capture and the decoding are measured as the stages "capture" and "decode"
+
+    def __init__(self, camera, quality = 100, timings = None):
+        self.camera = camera
+        self.quality = quality
+        self.timings = timings
+        self.stream = BytesIO() # stream reused for every picture
+
+    def measure(self, name, cycle):
+        return self.timings.measure(name, cycle) if (self.timings is not None) else nullcontext()
+
+    def capture(self, cycle = None):
+        # takes a picture and returns it as an OpenCV image, with its EXIF data (None if there is none)
+        # the times of the stages are added to the dictionary 'cycle', if it is given
+        # empty the stream and capture the JPEG file into it
+        with self.measure("capture", cycle):
+            self.stream.seek(0)
+            self.stream.truncate()
+            self.camera.capture(self.stream, format = "jpeg", quality = self.quality)
+            data = self.stream.getvalue()
+
+        # decode the picture
+        with self.measure("decode", cycle):
+            image = cv2.imdecode(np.frombuffer(data, dtype = np.uint8), cv2.IMREAD_COLOR)
+        if (image is None):
+            raise ValueError("Unable to decode the picture")
+
+        # keep the EXIF data (the location set in camera.exif_tags)
+        return image, jpeg.readExif(data)
@@ -0,0 +1,99 @@
+from threading import Condition, get_ident
+from datetime import datetime, timedelta
+from time import monotonic
+
+# clocks of the program
+# every part of main.py that needs the time (the deadline, the intervals, the log, the position of the ISS) asks it to the clock,
+# and every wait goes through clock.wait(), so that the whole mission can be replayed faster than in real time with a VirtualClock:
+# - Clock is the real clock (the monotonic clock, the system time and the normal waits)
+# - VirtualClock runs ahead of the real clock: its time is the real time plus all the time that has been skipped. The thread that
+#   drives the program (the scheduler, which calls wait() with drive = True) does not sleep: it waits only until the other threads
+#   are idle (they would work during the sleep on the Astro Pi) and then skips the rest of the sleep. So the time measured by the clock
+#   is the real processing time plus the simulated sleeps, and a mission of 3 hours takes only the time needed to process its pictures.
+#   The other threads (for example the sampler of the SenseHat) wait until the virtual time is reached, and the driving thread stops
+#   the skips at their times, so that they still run at their rates
+
+class Clock:
+    # real clock
+
+    def monotonic(self):
+        # time in seconds, not affected by the changes of the system clock
+        return monotonic()
+
+    def now(self):
+        # date and time
+        return datetime.now()
+
+    def offset(self):
+        # seconds that the clock is ahead of the real time
+        return 0
+
+    def wait(self, seconds, event, drive = False):
+        # waits 'seconds' seconds or until 'event' is set, returns True if the event has been set
+        return event.wait(max(seconds, 0))
+
+class VirtualClock(Clock):
+    # clock that skips the sleeps of the thread that drives the program
+    # 'idle()' returns True when the stages of the program have finished their work (None if there is nothing to wait for)
+    # the other threads that wait on the clock are woken up at their times: the driving thread skips only to the first of them,
+    # and goes on only when all of them are waiting again
+
+    def __init__(self, idle = None, poll = 0.001):
+        self.idle = idle
+        self.poll = poll # seconds between the checks of idle()
+        self.skipped = 0 # seconds skipped
+        self.condition = Condition()
+        self.threads = {} # times until which the other threads are waiting, None while they are working
+
+    def monotonic(self):
+        return monotonic() + self.skipped
+
+    def now(self):
+        return datetime.now() + timedelta(seconds = self.skipped)
+
+    def offset(self):
+        return self.skipped
+
+    def ready(self):
+        # returns True if the stages are idle and all the other threads are waiting for a time that has not come yet
+        with self.condition:
+            now = self.monotonic()
+            if (any(((time is None) or (time <= now)) for time in self.threads.values())):
+                return False
+        return (self.idle is None) or self.idle()
+
+    def wait(self, seconds, event, drive = False):
+        target = self.monotonic() + seconds
+        if (not drive):
+            return self.waitUntil(target, event)
+
+        while True:
+            # wait until the other threads are ready, as long as the sleep has not already passed in real time
+            while ((not self.ready()) and (self.monotonic() < target)):
+                if (event.wait(self.poll)):
+                    return True
+            if (event.is_set()):
+                return True
+            # skip to the end of the sleep, or to the first time when another thread has to wake up
+            with self.condition:
+                now = self.monotonic()
+                if (now >= target):
+                    return False
+                step = min([target] + [time for time in self.threads.values() if (time is not None)])
+                self.skipped += max(step - now, 0)
+                self.condition.notify_all()
+
+    def waitUntil(self, target, event):
+        # the other threads wait until the time is reached, because of the real time or of the skips of the driving thread
+        # (the waits are short, so that they also notice when 'event' is set)
+        thread = get_ident()
+        with self.condition:
+            self.threads[thread] = target
+            while ((not event.is_set()) and (self.monotonic() < target)):
+                self.condition.wait(min(target - self.monotonic(), 0.05))
+            if (event.is_set()):
+                # the thread stops: the driving thread no longer waits for it
+                del self.threads[thread]
+                return True
+            self.threads[thread] = None
+        return False
@@ -0,0 +1,106 @@
+from pathlib import Path
+import numpy as np
+import cv2
+
+# image enhancement without PIL
+# PIL's ImageEnhance.Contrast and ImageEnhance.Brightness blend every channel of the image with a "degenerate" grey image:
+#   out = degenerate + factor * (in - degenerate)
+# computed in single precision, truncated and clipped to 0-255, where the degenerate image is black for the brightness
+# and the rounded mean of the greyscale ('L') image for the contrast
+# since the result only depends on the value of the pixel, both can be precomputed as 256-entry lookup tables and applied with cv2.LUT,
+# giving exactly the same result as PIL without converting the image to RGB and to PIL and back
+
+# weights used by PIL to convert an RGB image into greyscale ('L'): L = (19595 R + 38470 G + 7471 B + 0x8000) >> 16
+lumaWeights = (19595, 38470, 7471)
+
+# all the possible values of a pixel
+levels = np.arange(256, dtype = np.float32)
+
+def greySum(im, rgb = False, grey = None, scratch = None):
+    # returns the sum of the greyscale values of the image, converted exactly like PIL does
+    # 'im' is a BGR image (RGB if 'rgb' is True) or a single channel image
+    # the sums of different parts of an image can be added together to get the mean of the whole image
+    # 'grey' and 'scratch' can be preallocated uint32 images of the same size, to avoid allocating new ones
+
+    if (im.ndim == 2):
+        # the image is already greyscale
+        return int(np.sum(im, dtype = np.uint64))
+
+    # get the weights in the order of the channels of the image
+    wr, wg, wb = lumaWeights
+    w0, w1, w2 = (wr, wg, wb) if rgb else (wb, wg, wr)
+    # calculate the exact greyscale value of each pixel with integers
+    grey = np.multiply(im[:, :, 0], np.uint32(w0), out = grey, dtype = np.uint32)
+    grey += np.multiply(im[:, :, 1], np.uint32(w1), out = scratch, dtype = np.uint32)
+    grey += np.multiply(im[:, :, 2], np.uint32(w2), out = scratch, dtype = np.uint32)
+    grey += 0x8000
+    grey >>= 16
+    return int(np.sum(grey, dtype = np.uint64))
+
+def roundMean(total, pixels):
+    # PIL rounds the mean to the nearest integer
+    return int(total / pixels + 0.5)
+
+def greyMean(im, rgb = False):
+    # returns the mean of the greyscale image, rounded like PIL does
+    # 'im' is a BGR image (RGB if 'rgb' is True) or a single channel image
+    return roundMean(greySum(im, rgb), im.shape[0] * im.shape[1])
+
+def blendLut(degenerate, factor):
+    # returns the lookup table of PIL's blend between a uniform image of value 'degenerate' and the image itself
+    # the operations are done in float32 like in PIL, then the result is truncated and clipped
+    lut = np.float32(degenerate) + np.float32(factor) * (levels - np.float32(degenerate))
+    return np.clip(lut, 0, 255).astype(np.uint8)
+
+def contrastLut(mean, factor):
+    # lookup table equivalent to ImageEnhance.Contrast(image).enhance(factor), given the grey mean of the image
+    return blendLut(mean, factor)
+
+def brightnessLut(factor):
+    # lookup table equivalent to ImageEnhance.Brightness(image).enhance(factor)
+    return blendLut(0, factor)
+
+def contrast(im, factor, rgb = False):
+    # changes the contrast of the image exactly like ImageEnhance.Contrast(image).enhance(factor)
+    # 'im' is a BGR image (RGB if 'rgb' is True) or a single channel image
+    return cv2.LUT(im, contrastLut(greyMean(im, rgb), factor))
+
+def brightness(im, factor):
+    # changes the brightness of the image exactly like ImageEnhance.Brightness(image).enhance(factor)
+    return cv2.LUT(im, brightnessLut(factor))
+
+def main():
+    # regression check: compare the lookup tables with PIL on the pictures in the repository
+    from PIL import Image, ImageEnhance
+
+    picsFolder = Path(__file__).parent.resolve().parent / "Pictures"
+    factors = [0.5, 1.15, 1.5, 1.75, 2.0, 2.5, 100.0]
+    errors = 0
+    for picPath in sorted(picsFolder.glob("*.*g")):
+        im = cv2.imread(str(picPath))
+        if (im is None):
+            continue
+        im = cv2.resize(im, None, fx = 0.25, fy = 0.25)
+        pilImage = Image.fromarray(cv2.cvtColor(im, cv2.COLOR_BGR2RGB))
+        pilGrey = pilImage.convert("L")
+
+        for factor in factors:
+            # BGR image
+            expected = cv2.cvtColor(np.array(ImageEnhance.Contrast(pilImage).enhance(factor)), cv2.COLOR_RGB2BGR)
+            errors += int(not np.array_equal(contrast(im, factor), expected))
+            # the same array read as RGB
+            expected = np.array(ImageEnhance.Contrast(Image.fromarray(im)).enhance(factor))
+            errors += int(not np.array_equal(contrast(im, factor, rgb = True), expected))
+            # greyscale image
+            expected = np.array(ImageEnhance.Contrast(pilGrey).enhance(factor))
+            errors += int(not np.array_equal(contrast(np.array(pilGrey), factor), expected))
+            # brightness
+            expected = cv2.cvtColor(np.array(ImageEnhance.Brightness(pilImage).enhance(factor)), cv2.COLOR_RGB2BGR)
+            errors += int(not np.array_equal(brightness(im, factor), expected))
+
+        print(picPath.name, "checked")
+
+    print("Differences from PIL:", errors)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+from threading import Lock
+from collections import deque
+import math
+import numpy as np
+
+# area of the Earth seen in the pictures, and overlap between the pictures
+# at 400km the camera sees an area of almost 400km, while the ISS moves by about 7km every second: two pictures taken 3 seconds apart
+# show almost the same ground. The footprint of a picture is modelled as a circle (the window of the ISS is cropped as a circle) whose
+# diameter is the distance seen by the camera at the altitude of the ISS (estimateDistance(), as in createdataset.py), centred on the
+# position of the ISS; the overlap of a new picture is the fraction of its footprint that is already in one of the last pictures saved
+# overlapInterval() gives the seconds between two pictures whose footprints overlap by a given fraction: main.py does not take the pictures
+# closer than the overlap above which a picture gets a smaller share of the storage (captureInterval()), so that over land the pictures
+# at the shortest interval are saved with their whole share, and no picture is decoded only to be skipped
+
+earthRadius = 6371000 # mean radius of the Earth [m]
+groundSpeed = 7170 # speed of the point of the Earth below the ISS [m/s] (7.66km/s at 420km, on a sphere of radius 'earthRadius'), without the ground track
+nominalAltitude = 420000 # altitude of the ISS when it is not known [m]
+
+def estimateDistance(alt):
+    sensorHeight = 0.004712 # real size of the Camera Module sensor
+    focalLength = 0.005
+    # actual distance on the surface in meters from the center (height)
+    # it can be found with the formula distance = altitude * sensorHeight / focalLength
+    return (alt * sensorHeight / focalLength)
+
+def groundDistance(latitude1, longitude1, latitude2, longitude2):
+    # returns the distance on the surface of the Earth [m] between two points (in degrees), with the haversine formula
+    # (or the distances between the points of arrays of the same length)
+    latitude1, longitude1, latitude2, longitude2 = np.radians([latitude1, longitude1, latitude2, longitude2])
+    a = np.sin((latitude2 - latitude1) / 2) ** 2 + np.cos(latitude1) * np.cos(latitude2) * np.sin((longitude2 - longitude1) / 2) ** 2
+    distance = 2 * earthRadius * np.arcsin(np.sqrt(np.minimum(a, 1)))
+    return float(distance) if (np.ndim(distance) == 0) else distance
+
+def trackSpeed(track):
+    # returns the lowest speed [m/s] of the point below the ISS along the ground track 'track' (it changes with the rotation of the Earth)
+    distances = groundDistance(track.latitude[:-1], track.longitude[:-1], track.latitude[1:], track.longitude[1:])
+    return float(np.min(distances)) / track.step
+
+def circleOverlap(distance, diameter):
+    # returns the fraction of the area of a circle of diameter 'diameter' covered by a circle of the same diameter whose centre is
+    # 'distance' away (1 if they are the same circle, 0 if they do not touch)
+    if (distance >= diameter):
+        return 0.0
+    # area of the intersection of two circles of radius r at distance d: 2r²acos(d/2r) - d/2 * sqrt(4r² - d²)
+    r = diameter / 2
+    intersection = 2 * r * r * np.arccos(distance / diameter) - distance / 2 * np.sqrt(diameter * diameter - distance * distance)
+    return float(intersection / (np.pi * r * r))
+
+def overlapInterval(fraction, altitude = nominalAltitude, speed = groundSpeed):
+    # returns the seconds between two pictures taken from 'altitude' [m] whose footprints overlap by 'fraction', moving at 'speed' [m/s]
+    # the overlap decreases with the distance between the centres: the distance is found by bisection between 0 and the diameter
+    diameter = estimateDistance(altitude)
+    low, high = 0.0, diameter
+    for i in range(50):
+        middle = (low + high) / 2
+        if (circleOverlap(middle, diameter) > fraction):
+            low = middle
+        else:
+            high = middle
+    return high / speed
+
+def captureInterval(fraction, altitude = nominalAltitude, speed = groundSpeed, minimum = 3):
+    # returns the shortest interval between the pictures [s]: 'minimum', or longer if the pictures taken closer would overlap by more than
+    # 'fraction' (rounded up to a whole second, so that the pictures at that interval overlap by less than 'fraction' even if they are
+    # taken a few milliseconds early)
+    return max(minimum, math.ceil(overlapInterval(fraction, altitude, speed)))
+
+def overlapWeight(overlap, downgrade):
+    # returns the weight of the share of the storage of a picture whose footprint overlaps by 'overlap': half above 'downgrade'
+    return 0.5 if (overlap > downgrade) else 1
+
+class FootprintHistory:
+    # footprints of the last 'size' pictures kept
+    # overlap() and add() are both called by the analysis stage, when it decides whether the picture is kept, so that the decision does not
+    # depend on how far the write stage is behind; discard() removes a picture that is not saved after all
+
+    def __init__(self, size = 10):
+        self.footprints = deque(maxlen = size) # (number of the picture, latitude, longitude, diameter) of the pictures kept
+        self.lock = Lock()
+
+    def add(self, n, altitude, latitude, longitude):
+        # adds the footprint of the picture number 'n', taken from 'altitude' [m] over 'latitude' and 'longitude' [Deg]
+        with self.lock:
+            self.footprints.append((n, latitude, longitude, estimateDistance(altitude)))
+
+    def discard(self, n):
+        # removes the footprint of the picture number 'n'
+        with self.lock:
+            self.footprints = deque([footprint for footprint in self.footprints if (footprint[0] != n)], maxlen = self.footprints.maxlen)
+
+    def overlap(self, altitude, latitude, longitude):
+        # returns the highest fraction of the footprint of a picture taken from 'altitude' [m] over 'latitude' and 'longitude' [Deg]
+        # that is in the footprint of one of the last pictures kept, and the number of that picture (None if there is none)
+        diameter = estimateDistance(altitude)
+        best, bestN = 0.0, None
+        with self.lock:
+            footprints = list(self.footprints)
+        for n, savedLatitude, savedLongitude, savedDiameter in footprints:
+            # the two footprints have almost the same size (the altitude changes by a few km at most): their mean is used
+            fraction = circleOverlap(groundDistance(latitude, longitude, savedLatitude, savedLongitude), (diameter + savedDiameter) / 2)
+            if (fraction > best):
+                best, bestN = fraction, n
+        return best, bestN
+
+def main():
+    # check: along an orbit inclined like the one of the ISS, the pictures taken at the interval of captureInterval() over land keep the whole
+    # share of the storage, and the pictures taken every 3 seconds are skipped (with the limits of main.py)
+    maxOverlap, downgradeOverlap = 0.85, 0.8
+    inclination = np.radians(51.6)
+    def position(time):
+        # latitude and longitude [Deg] of the point below the ISS 'time' seconds after it crosses the equator, on a sphere that does not turn
+        angle = groundSpeed * time / earthRadius
+        latitude = np.degrees(np.arcsin(np.sin(inclination) * np.sin(angle)))
+        longitude = np.degrees(np.arctan2(np.cos(inclination) * np.sin(angle), np.cos(angle)))
+        return float(latitude), float(longitude)
+
+    for interval, skipped in [(captureInterval(downgradeOverlap), False), (3, True)]:
+        history = FootprintHistory()
+        weights, skips = [], 0
+        for n in range(int(5400 / interval)):
+            latitude, longitude = position(n * interval)
+            overlap, overlapN = history.overlap(nominalAltitude, latitude, longitude)
+            if (overlap > maxOverlap):
+                skips += 1
+                continue
+            weights.append(overlapWeight(overlap, downgradeOverlap))
+            history.add(n, nominalAltitude, latitude, longitude)
+        if skipped:
+            assert skips > 0, "no picture skipped every " + str(interval) + "s"
+        else:
+            assert (skips == 0) and (min(weights) == 1), "pictures every " + str(interval) + "s skipped or downgraded"
+        print("Every " + str(interval) + "s: " + str(len(weights)) + " pictures kept, " + str(skips) + " skipped, "
+              + str(weights.count(0.5)) + " with half of their share")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+from threading import Lock
+import subprocess
+import os
+
+# processing tiers of the analysis stage, chosen from the temperature, the frequency and the load of the processor
+# in the closed case of the Astro Pi the Raspberry Pi heats up, and above 80°C its firmware lowers the frequency of the cores:
+# the segmentation then takes longer, the queues fill up and the pictures are dropped ("Previous pictures still being processed")
+# instead of waiting for that, the governor lowers the work of every picture before the processor throttles, and raises it again
+# when the processor has cooled down, so that a picture can still be analysed at every interval:
+# - full: the picture is scaled to 1/4 and segmented in the analysis stage (by the segmentation processes instead, only if main.py
+#   starts them: 'segmentationProcesses' is 1 by default, since benchmark.py measures them slower than the main process)
+# - reduced: the picture is scaled to 1/8 (a quarter of the pixels to segment), like at the full tier
+# - light: at 1/8, segmented in the analysis stage without the blur and the filling of the masks (the label map is noisier)
+# - gate: only the thumbnail of the relevance gate is segmented, and its estimated score decides whether the picture is saved
+# the frequency alone does not say that the processor is throttled: with the ondemand or schedutil governor of Linux an idle Raspberry Pi
+# runs at 600MHz of 1500MHz. The throttling is read from the firmware (vcgencmd get_throttled), or from the highest frequency allowed by
+# the kernel (scaling_max_freq), which the thermal driver lowers below the maximum of the processor (cpuinfo_max_freq)
+# the load of the segmentation processes is expected: the limits of the load per core are raised by the number of processes per core
+# the governor goes down one tier when the processor is under pressure for 'downSamples' samples in a row, and up one tier when it
+# has been calm (with a margin below the limits, so that it does not go up and down every sample) for 'upSamples' samples in a row
+
+tiers = [
+    {"name": "full", "scalingFactor": 0.25, "smooth": True, "segment": True},
+    {"name": "reduced", "scalingFactor": 0.125, "smooth": True, "segment": True},
+    {"name": "light", "scalingFactor": 0.125, "smooth": False, "segment": True},
+    {"name": "gate", "scalingFactor": 0.125, "smooth": False, "segment": False}
+]
+
+# files of the Linux kernel with the temperature of the SoC [m°C], and the current frequency of the first core, the highest frequency
+# allowed now and the maximum frequency of the processor [kHz]
+thermalPath = "/sys/class/thermal/thermal_zone0/temp"
+frequencyPath = "/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq"
+allowedFrequencyPath = "/sys/devices/system/cpu/cpu0/cpufreq/scaling_max_freq"
+maxFrequencyPath = "/sys/devices/system/cpu/cpu0/cpufreq/cpuinfo_max_freq"
+
+# bits of 'vcgencmd get_throttled' that mean that the processor is throttled now: frequency capped (1) and throttled (2)
+throttledBits = 0b110
+
+def readNumber(path):
+    # returns the number in the file 'path', or None if it cannot be read (for example on a computer without that file)
+    try:
+        with open(path, "r") as file:
+            return float(file.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def readThrottled():
+    # returns the bits of the throttling of the firmware of the Raspberry Pi, or None if they cannot be read (without vcgencmd)
+    try:
+        output = subprocess.run(["vcgencmd", "get_throttled"], capture_output = True, text = True, timeout = 2).stdout
+        return int(output.strip().split("=")[1], 16)
+    except (OSError, subprocess.SubprocessError, IndexError, ValueError):
+        return None
+
+def readProcessor():
+    # returns the temperature of the SoC [°C], its current, allowed and maximum frequency [MHz], whether it is throttled and the load per core
+    # (the mean number of processes running or waiting for a core in the last minute, divided by the number of cores)
+    # the values that cannot be read are None
+    temperature = readNumber(thermalPath)
+    frequency = readNumber(frequencyPath)
+    allowedFrequency = readNumber(allowedFrequencyPath)
+    maxFrequency = readNumber(maxFrequencyPath)
+    bits = readThrottled()
+    try:
+        load = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        load = None
+    return {
+        "temperature": (temperature / 1000) if (temperature is not None) else None,
+        "frequency": (frequency / 1000) if (frequency is not None) else None,
+        "allowedFrequency": (allowedFrequency / 1000) if (allowedFrequency is not None) else None,
+        "maxFrequency": (maxFrequency / 1000) if (maxFrequency is not None) else None,
+        "throttled": ((bits & throttledBits) != 0) if (bits is not None) else None,
+        "load": load
+    }
+
+def throttledNow(readings):
+    # returns True if the readings say that the processor is throttled: from the firmware, or from the highest frequency allowed by the kernel
+    # (the current frequency is not used: it is low when the processor is idle)
+    if (readings.get("throttled")):
+        return True
+    allowedFrequency, maxFrequency = readings.get("allowedFrequency"), readings.get("maxFrequency")
+    return (allowedFrequency is not None) and (maxFrequency is not None) and (allowedFrequency < maxFrequency)
+
+class Governor:
+    # chooses the tier of the analysis stage from the readings of 'read()' (readProcessor() by default)
+    # update() is called periodically by the scheduler, tier() by the analysis stage for every picture
+    # the pressure starts at 'hotTemperature' [°C], when the processor is throttled, or at a load per core above 'highLoad'; the processor is
+    # calm below 'coolTemperature', when it is not throttled and below 'lowLoad'
+    # both limits of the load are raised by the 'processes' segmentation processes per core, which are busy with every picture
+
+    def __init__(self, read = readProcessor, hotTemperature = 75, coolTemperature = 68, highLoad = 1.5, lowLoad = 1.0, processes = 0,
+                 downSamples = 2, upSamples = 6):
+        self.read = read
+        self.hotTemperature = hotTemperature
+        self.coolTemperature = coolTemperature
+        allowance = processes / (os.cpu_count() or 1)
+        self.highLoad = highLoad + allowance
+        self.lowLoad = lowLoad + allowance
+        self.downSamples = downSamples
+        self.upSamples = upSamples
+        self.level = 0 # index of the tier in 'tiers'
+        self.pressure = 0 # samples in a row under pressure
+        self.calm = 0 # samples in a row calm
+        self.readings = {} # last readings
+        self.transitions = 0
+        self.lock = Lock()
+
+    def tier(self):
+        # returns the current tier (a dictionary of 'tiers')
+        with self.lock:
+            return tiers[self.level]
+
+    def causes(self, readings):
+        # returns the reasons why the processor is under pressure, and whether it is calm
+        temperature, load = readings.get("temperature"), readings.get("load")
+        throttled = throttledNow(readings)
+        causes = []
+        if ((temperature is not None) and (temperature >= self.hotTemperature)):
+            causes.append("temperature")
+        if (throttled):
+            causes.append("throttled")
+        if ((load is not None) and (load > self.highLoad)):
+            causes.append("load")
+        calm = (((temperature is None) or (temperature < self.coolTemperature)) and (not throttled) and ((load is None) or (load < self.lowLoad)))
+        return causes, calm
+
+    def update(self):
+        # reads the processor and changes the tier if needed
+        # returns the line of the log of the transition, or None if the tier has not changed
+        readings = self.read()
+        causes, calm = self.causes(readings)
+        with self.lock:
+            self.readings = readings
+            self.pressure = (self.pressure + 1) if (len(causes) > 0) else 0
+            self.calm = (self.calm + 1) if calm else 0
+
+            old = self.level
+            if ((self.pressure >= self.downSamples) and (self.level < len(tiers) - 1)):
+                self.level += 1
+            elif ((self.calm >= self.upSamples) and (self.level > 0)):
+                self.level -= 1
+            if (self.level == old):
+                return None
+            # the samples are counted again from the new tier
+            self.pressure, self.calm = 0, 0
+            self.transitions += 1
+            reason = ", ".join(causes) if (self.level > old) else "calm"
+            return "Governor - tier " + tiers[old]["name"] + " -> " + tiers[self.level]["name"] + " (" + reason + ") [" + self.describe(readings) + "]"
+
+    def describe(self, readings = None):
+        # returns the readings for the log
+        readings = self.readings if (readings is None) else readings
+        values = []
+        if (readings.get("temperature") is not None):
+            values.append("temperature: " + str(round(readings["temperature"], 1)) + "°C")
+        if (readings.get("frequency") is not None):
+            values.append("frequency: " + str(round(readings["frequency"])) + ((" of " + str(round(readings["maxFrequency"]))) if (readings.get("maxFrequency") is not None) else "") + "MHz")
+        if ((readings.get("throttled") is not None) or (readings.get("allowedFrequency") is not None)):
+            values.append("throttled: " + ("yes" if throttledNow(readings) else "no"))
+        if (readings.get("load") is not None):
+            values.append("load per core: " + str(round(readings["load"], 2)))
+        return ", ".join(values) if (len(values) > 0) else "no readings"
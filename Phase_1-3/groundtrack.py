@@ -0,0 +1,66 @@
+from time import monotonic
+import numpy as np
+
+# position of the ISS and sunlight for the whole program, computed once at the start
+# skyfield computes the orbit for every 'step' seconds of the program in a single vectorised call (instead of building a new timescale
+# and running the SGP4 model and the ephemeris for every position that is needed), and the positions in between are interpolated:
+# the ISS moves by less than 8km per second, so a linear interpolation over one second is far more precise than the data of the orbit
+
+class GroundTrack:
+    # table of the positions of the ISS every 'step' seconds from the monotonic time 'origin'
+    # 'altitude' [m], 'latitude', 'longitude' [Deg] and 'sunlit' are arrays with one value for every step
+
+    def __init__(self, origin, step, altitude, latitude, longitude, sunlit):
+        self.origin = origin
+        self.step = step
+        self.altitude = np.asarray(altitude, dtype = np.float64)
+        self.latitude = np.asarray(latitude, dtype = np.float64)
+        # the longitude jumps from 180° to -180°: it is kept continuous for the interpolation, and brought back between -180° and 180° after
+        self.longitude = np.degrees(np.unwrap(np.radians(np.asarray(longitude, dtype = np.float64))))
+        self.sunlit = np.asarray(sunlit, dtype = bool)
+        self.end = origin + (len(self.altitude) - 1) * step # last time in the table
+
+    def covers(self, time = None):
+        # returns True if the time is in the table
+        time = monotonic() if (time is None) else time
+        return (self.origin <= time <= self.end)
+
+    def position(self, time = None):
+        # returns the altitude [m], the latitude and the longitude [Deg] of the ISS at the monotonic time 'time' (now by default)
+        # raises ValueError if the time is not in the table
+        time = monotonic() if (time is None) else time
+        if (not self.covers(time)):
+            raise ValueError("Time outside the ground track")
+        offset = (time - self.origin) / self.step
+        i = min(int(offset), len(self.altitude) - 2)
+        fraction = offset - i
+        altitude = self.altitude[i] + (self.altitude[i + 1] - self.altitude[i]) * fraction
+        latitude = self.latitude[i] + (self.latitude[i + 1] - self.latitude[i]) * fraction
+        longitude = self.longitude[i] + (self.longitude[i + 1] - self.longitude[i]) * fraction
+        return float(altitude), float(latitude), float((longitude + 180) % 360 - 180)
+
+    def isSunlit(self, time = None):
+        # returns True if the ISS is in sunlight at the monotonic time 'time' (now by default), from the nearest step of the table
+        # raises ValueError if the time is not in the table
+        time = monotonic() if (time is None) else time
+        if (not self.covers(time)):
+            raise ValueError("Time outside the ground track")
+        return bool(self.sunlit[int(round((time - self.origin) / self.step))])
+
+def computeGroundTrack(satellite, ephemeris, duration, step = 1, start = None, origin = None):
+    # returns the ground track of 'satellite' (the ISS of the orbit library) for 'duration' seconds from now, every 'step' seconds
+    # a different 'start' (a skyfield time) can be given to compute the ground track offline: the table then starts at the
+    # monotonic time 'origin' (the current one by default) as if the program had started at 'start'
+    # (skyfield is only needed here, so the table can be used and tested without it)
+    from skyfield.api import load
+    timescale = load.timescale()
+    start = timescale.now() if (start is None) else start
+    origin = monotonic() if (origin is None) else origin
+
+    # all the times of the table, computed with one call of the orbit and one of the ephemeris
+    seconds = np.arange(0, duration + step, step)
+    times = timescale.tt_jd(start.tt + seconds / 86400)
+    geocentric = satellite.at(times)
+    subpoint = geocentric.subpoint()
+    sunlit = geocentric.is_sunlit(ephemeris)
+    return GroundTrack(origin, step, subpoint.elevation.m, subpoint.latitude.degrees, subpoint.longitude.degrees, sunlit)
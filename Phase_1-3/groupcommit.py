@@ -0,0 +1,170 @@
+from threading import Thread, Event, Lock
+from time import monotonic
+import atexit
+import os
+
+# text file whose records are kept in memory and saved to the disk together (group commit)
+# instead of flushing and syncing the file after every line, the lines are saved with a single fsync every 'interval' seconds,
+# or as soon as 'records' lines are waiting: at most the lines of the last 'interval' seconds can be lost if the power is cut
+# the file is also saved when it is closed, and when the program ends (also because of an exception)
+# a line that was being written when the program was killed is removed by recover() the next time the file is opened
+# if the disk returns an error, nothing is written twice: the bytes that were not written are kept and written at the next commit,
+# and if they were all written but not synced, the next commit only syncs the file again
+# binary files (with records of fixed size) can be written in the same way, but then the incomplete records must be removed by the caller
+
+def recover(path, blockSize = 65536):
+    # removes the last line of the file 'path' if it is incomplete (it does not end with a new line)
+    # returns the number of bytes removed
+    if (not os.path.exists(path)):
+        return 0
+    with open(path, "rb+") as file:
+        size = file.seek(0, os.SEEK_END)
+        # find the last new line, reading the file backwards one block at a time
+        end = size
+        while (end > 0):
+            start = max(end - blockSize, 0)
+            file.seek(start)
+            block = file.read(end - start)
+            if ((end == size) and block.endswith(b"\n")):
+                return 0
+            newline = block.rfind(b"\n")
+            if (newline >= 0):
+                end = start + newline + 1
+                break
+            end = start
+        file.truncate(end)
+        file.flush()
+        os.fsync(file)
+        return size - end
+
+class GroupCommitFile:
+    # text file opened for appending, whose lines are saved to the disk in groups (or binary file, if 'binary' is True)
+    # write() can be called from different threads; it never waits for the disk, unless 'records' lines are waiting
+    # (and it never raises the errors of the disk: they are printed, and the lines are saved again at the next interval)
+    # after close(), a line is appended to the file directly: a thread that is still running at the end of the program can still log
+
+    def __init__(self, path, interval = 5, records = 50, binary = False):
+        self.path = path
+        self.interval = interval # maximum seconds between the commits
+        self.records = records # maximum number of lines waiting for a commit
+        self.binary = binary
+        self.recovered = 0 if binary else recover(path) # bytes of the incomplete last line that has been removed
+        # unbuffered, so that a write returns how many bytes have reached the file
+        self.file = open(path, "ab", buffering = 0)
+        self.size = self.file.tell() # size of the file when it was opened
+        self.pending = [] # lines waiting for a commit
+        self.unwritten = b"" # bytes of a commit that failed, not written yet
+        self.unsynced = False # whether bytes have been written since the last fsync
+        self.failed = False # whether the last commit failed
+        self.lock = Lock() # protects 'pending'
+        self.fileLock = Lock() # only one commit at a time
+        self.commits = 0
+        self.lastCommit = monotonic()
+        self.stopEvent = Event()
+        self.closed = False
+        self.closedEvent = Event() # set when close() has saved the lines and closed the file
+
+        # commit the lines every 'interval' seconds in the background
+        self.thread = Thread(target = self.run, name = "commit " + os.path.basename(path), daemon = True)
+        self.thread.start()
+        # save the lines in memory when the program ends, also because of an exception
+        atexit.register(self.close)
+
+    def write(self, text):
+        # adds a record (one or more complete lines) to the file
+        with self.lock:
+            closed = self.closed
+            if (not closed):
+                self.pending.append(text)
+                full = (len(self.pending) >= self.records)
+        if closed:
+            self.writeClosed(text)
+            return
+        # after an error, the lines are only saved by the background thread, so that the callers do not retry on every line
+        if (full and (not self.failed)):
+            self.save()
+
+    def commit(self):
+        # writes the lines that are waiting and saves them to the disk with a single fsync
+        # if the disk returns an error, it is raised and the lines that have not been saved are kept for the next commit
+        with self.fileLock:
+            with self.lock:
+                lines = self.pending
+                self.pending = []
+            if (len(lines) > 0):
+                self.unwritten += b"".join(lines) if self.binary else "".join(lines).encode("utf-8")
+            try:
+                # only the bytes that have not been written yet are written (the write can stop in the middle of a line)
+                while (len(self.unwritten) > 0):
+                    written = self.file.write(self.unwritten)
+                    self.unwritten = self.unwritten[written:]
+                    self.unsynced = True
+                if (self.unsynced):
+                    os.fsync(self.file.fileno())
+                    self.unsynced = False
+                    self.commits += 1
+                self.failed = False
+            except Exception:
+                self.failed = True
+                raise
+            finally:
+                self.lastCommit = monotonic()
+
+    def save(self):
+        # commits the lines, printing the error of the disk instead of raising it (they are saved again at the next interval)
+        try:
+            self.commit()
+        except Exception as e:
+            print("Unable to save " + self.path + ": " + str(e))
+
+    def writeClosed(self, text):
+        # appends a record to the file after close(), opening it again once close() has saved the lines that were waiting
+        self.closedEvent.wait()
+        try:
+            with self.fileLock:
+                with open(self.path, "ab") as file:
+                    file.write(text if self.binary else text.encode("utf-8"))
+                    file.flush()
+                    os.fsync(file)
+        except Exception as e:
+            print("Unable to save " + self.path + ": " + str(e))
+
+    def run(self):
+        while (not self.stopEvent.wait(max(self.lastCommit + self.interval - monotonic(), 0))):
+            self.save()
+
+    def flush(self):
+        # like the flush() of a file, but the lines are also saved to the disk
+        self.commit()
+
+    def close(self):
+        # saves the lines that are waiting and closes the file (it can be called more than once)
+        with self.lock:
+            if (self.closed):
+                return
+            self.closed = True
+        self.stopEvent.set()
+        self.thread.join()
+        try:
+            self.commit()
+        finally:
+            self.file.close()
+            self.closedEvent.set()
+        atexit.unregister(self.close)
+
+def main():
+    # check: the lines written before and after close() are all in the file, once and in order
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), "log.txt")
+    file = GroupCommitFile(path, interval = 1, records = 3)
+    for i in range(5):
+        file.write("line " + str(i) + "\n")
+    file.close()
+    file.write("line 5\n")
+    with open(path, "r", encoding = "utf-8") as saved:
+        lines = saved.read().splitlines()
+    assert lines == ["line " + str(i) for i in range(6)], lines
+    print("Lines saved before and after close(): " + str(len(lines)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+import struct
+import cv2
+
+# functions that work directly on the bytes of JPEG files, without decoding them
+# a JPEG file is a list of segments: each one starts with a marker (0xFF followed by its type) and, except for a few markers,
+# the length of the segment (2 bytes, big-endian, including the length itself); the EXIF data is in the APP1 segment,
+# after the header "Exif\0\0", and the compressed image starts after the SOS segment
+
+# types of the markers
+SOI = 0xD8 # start of image
+EOI = 0xD9 # end of image
+SOS = 0xDA # start of scan (the compressed image follows)
+APP0 = 0xE0 # application segment 0 (JFIF)
+APP1 = 0xE1 # application segment 1 (EXIF)
+TEM = 0x01 # temporary marker, without length
+RST = range(0xD0, 0xD8) # restart markers, without length
+
+exifHeader = b"Exif\x00\x00"
+
+def segments(data):
+    # yields (type, start, end) for every segment before the compressed image, where data[start:end] is the whole segment
+    # raises ValueError if the data is not a JPEG file
+    if (data[:2] != b"\xff\xd8"):
+        raise ValueError("Not a JPEG file")
+    pos = 2
+    while (pos + 4 <= len(data)):
+        if (data[pos] != 0xFF):
+            raise ValueError("Invalid JPEG marker at byte " + str(pos))
+        kind = data[pos + 1]
+        if (kind == 0xFF):
+            # fill byte before a marker
+            pos += 1
+            continue
+        if ((kind == SOI) or (kind == EOI) or (kind == TEM) or (kind in RST)):
+            yield kind, pos, pos + 2
+            if (kind == EOI):
+                return
+            pos += 2
+            continue
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        yield kind, pos, pos + 2 + length
+        if (kind == SOS):
+            return
+        pos += 2 + length
+
+def readExif(data):
+    # returns the EXIF data of the JPEG file in 'data' (bytes), in the same format as PIL's Image.info["exif"]
+    # (starting with "Exif\0\0"), or None if there is none
+    for kind, start, end in segments(data):
+        if ((kind == APP1) and (data[start + 4:start + 10] == exifHeader)):
+            return bytes(data[start + 4:end])
+    return None
+
+def exifSegment(exif):
+    # returns the APP1 segment that contains the EXIF data 'exif' (starting with "Exif\0\0")
+    if (not exif.startswith(exifHeader)):
+        raise ValueError("Invalid EXIF data")
+    if (len(exif) + 2 > 0xFFFF):
+        raise ValueError("EXIF data too long")
+    return b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+
+def insertExif(data, exif):
+    # returns the JPEG file 'data' with the EXIF data 'exif', without decoding the picture
+    # any EXIF data already in the file is replaced, and the new segment is put after the JFIF segment (which must be the first one)
+    data = bytes(data)
+    old = [(start, end) for kind, start, end in segments(data) if ((kind == APP1) and (data[start + 4:start + 10] == exifHeader))]
+    for start, end in reversed(old):
+        data = data[:start] + data[end:]
+    kind, start, end = next(segments(data), (None, 2, 2))
+    pos = end if (kind == APP0) else 2
+    return data[:pos] + exifSegment(exif) + data[pos:]
+
+def encode(image, exif = None, quality = 95):
+    # encodes the OpenCV image as a JPEG file with the given quality, and adds the EXIF data 'exif' if there is any
+    # the picture is compressed only once: the EXIF segment is added directly to the bytes of the file
+    success, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if (not success):
+        raise ValueError("Unable to encode the picture")
+    data = buffer.tobytes()
+    return data if (exif is None) else insertExif(data, exif)
+
+def rationals(value):
+    # converts an EXIF value in the format "a/b,c/d,..." (the one used by the PiCamera and by convertToExif() in main.py) into rationals
+    return tuple(IFDRational(*[int(part) for part in fraction.split("/")]) for fraction in value.split(","))
+
+def gpsExif(altitude, latitude, latitudeRef, longitude, longitudeRef):
+    # returns the EXIF data with only the location, for the pictures that do not have the EXIF data of the camera
+    # the values are in the same format as the exif_tags of the PiCamera: altitude "123/1", latitude and longitude "12/1,39/1,12365/1000",
+    # references "N"/"S" and "E"/"W"
+    exif = Image.Exif()
+    gps = exif.get_ifd(0x8825) # GPS IFD
+    gps[1] = latitudeRef # GPSLatitudeRef
+    gps[2] = rationals(latitude) # GPSLatitude
+    gps[3] = longitudeRef # GPSLongitudeRef
+    gps[4] = rationals(longitude) # GPSLongitude
+    gps[5] = 0 # GPSAltitudeRef: above sea level
+    gps[6] = rationals(altitude)[0] # GPSAltitude
+    return exif.tobytes()
@@ -1,52 +1,143 @@
-import numpy as np
-from PIL import Image
-from orbit import ISS, ephemeris
 from skyfield.api import load
 from pathlib import Path
-from PIL import Image, ImageEnhance
-from sense_hat import SenseHat
-from datetime import datetime, timedelta
-from picamera import PiCamera
-import csv
+from vision import segmentation, segmentationTiled, evaluate, relevanceGate, cropCircle, WindowTracker, SegmentationWorkspace
+from parallel import ParallelSegmentation
+from pipeline import Stage, offer, finish, idle
+from scheduler import Scheduler
+from capture import MemoryCapture
+from groundtrack import computeGroundTrack
+from planner import CapturePlanner
+from groupcommit import GroupCommitFile
+from sensors import SenseSampler, channels
+from footprint import FootprintHistory, captureInterval, overlapWeight, trackSpeed, nominalAltitude, groundSpeed
+from timing import Timings, MetricsFile
+from ratecontrol import RateController, texture
+from telemetry import TelemetryStore, newRecord, setSense, validTime, validPosition, formatValue, exportCsv
+from telemetry import load as loadTelemetry
+from backends import openCamera, openSense, openOrbit
+from clock import Clock, VirtualClock
+from governor import Governor, tiers
+import jpeg
+from datetime import timedelta
+from queue import Queue
+import argparse
 import os
+import numpy as np
 import cv2
 
-# get start time
-startTime = datetime.now()
+# clock of the program: the real one, or a virtual one that skips the sleeps to replay the mission faster (set at the start of main())
+clock = Clock()
 
-# initialise sense hat
-sense = SenseHat()
+# get start time
+startTime = clock.now()
 
 # get parent folder
 baseFolder = Path(__file__).parent.resolve()
 
-# open log file or create it if it does not exist
-logfile = open(str(baseFolder / "log.txt"), "a", encoding = "utf-8")
+# the lines of the log and the records of the telemetry are saved to the SD card together, with a single fsync every 'commitInterval' seconds
+# or every 'commitRecords' lines (and when the program ends, also because of an error)
+commitInterval = 5
+commitRecords = 50
+
+# number of processes that segment the pictures in parallel (the Raspberry Pi 4 has 4 cores), 1 to segment them in the main process
+# (1 until the parallel segmentation is measured faster on the Astro Pi: benchmark.py measures it slower than the main process
+# on the scaled pictures, because of the communication between the processes; with 1, every tier of the governor segments in the analysis stage)
+segmentationProcesses = 1
+
+# start the processes that segment the pictures in parallel, before the log starts its thread: the processes are forked,
+# and a process forked from a process with threads can block on a lock that one of them was holding (see parallel.py)
+# if they cannot be started, the pictures are segmented in the main process (the error is logged at the start of main())
+parallelSegmentation = None
+parallelError = None
+if (segmentationProcesses > 1):
+    try:
+        parallelSegmentation = ParallelSegmentation(segmentationProcesses)
+    except Exception as e:
+        parallelError = e
+
+# open log file or create it if it does not exist (an incomplete last line is removed)
+# the stages of the pipeline write to the log from different threads
+logfile = GroupCommitFile(str(baseFolder / "log.txt"), commitInterval, commitRecords)
+
+
+# size of the queues between the stages of the pipeline (number of pictures or data rows waiting for the next stage)
+queueSize = 1
+telemetryQueueSize = 4
+# seconds that all the stages together have to finish the pictures and the data in their queues after the end of the program
+# (the 2h59m of the scheduler, 'shutdownTime' and the export of the CSV files stay within the 3 hours)
+shutdownTime = 30
+
+# seconds between the rows of sense.csv, and between the reports of the scheduler in the log
+telemetryPeriod = 3
+housekeepingPeriod = 300
+
+# samples of the SenseHat per second, and number of samples kept (the rows of sense.csv use the samples since the previous row)
+senseRate = 10
+senseBufferSize = 1024
+
+# resolution of the table of the positions of the ISS [s], and seconds that it covers after the end of the program
+groundTrackStep = 1
+groundTrackMargin = 300
+
+# seconds between the pictures over the ocean, and degrees from the land in the land mask within which the ISS is considered over land
+oceanInterval = 30
+landMargin = 2
+
+# bytes of the Pictures folder (we went for 2.975GB to leave some wiggle room for safety), and lowest JPEG quality of the pictures at full resolution
+# (the pictures are compressed only once: the rate controller chooses the quality and the resolution of each one so that the whole budget is used)
+storageBudget = 2975000000
+qualityFloor = 75
+
+# fraction of the ground of a picture already in one of the last 'footprintHistory' pictures kept above which the picture is not analysed,
+# and above which it is saved with half of its share of the storage (at 400km, pictures 3, 6 and 9 seconds apart overlap by 93%, 86% and 79%)
+# the pictures are not taken closer than the interval at which two pictures overlap by 'downgradeOverlap' (9 or 10 seconds at 420km), so that
+# over land the pictures at the shortest interval keep their whole share, and 'maxOverlap' only skips the pictures taken closer than that
+maxOverlap = 0.85
+downgradeOverlap = 0.8
+footprintHistory = 10
+
+# seconds between the readings of the temperature, the frequency and the load of the processor, from which the governor chooses
+# how much work the analysis stage does for every picture (see governor.py)
+governorPeriod = 10
+
+# stages of the main loop whose times are written to metrics.csv, one row for every picture
+# (the times of all the stages, also of the telemetry and of the sensors, are summarised in the log every 'housekeepingPeriod' seconds)
+metricStages = ["capture", "decode", "resize", "window", "gate", "segmentation", "crop", "texture", "encode", "write"]
+
+# orbit of the ISS and ephemeris (set at the start of main())
+ISS = None
+ephemeris = None
+
+# positions of the ISS and sunlight for the whole program (computed at the start of main())
+groundTrack = None
+
+def parseArguments():
+    # on the Astro Pi the program runs without arguments, with the camera, the SenseHat and the orbit library
+    # on any other computer they can be replaced (see backends.py), for example:
+    # python main.py --images ../Pictures --sense synthetic --tle iss.tle --ephemeris de421.bsp
+    parser = argparse.ArgumentParser(description = "Parsec experiment on the Astro Pi")
+    parser.add_argument("--images", help = "folder of pictures taken instead of the ones of the camera")
+    parser.add_argument("--full-resolution", action = "store_true", help = "resize the pictures of --images to the resolution of the camera")
+    parser.add_argument("--sense", help = "data.csv or sense.csv whose values are read instead of the SenseHat, or 'synthetic'")
+    parser.add_argument("--tle", help = "file with the TLE of the ISS, used instead of the orbit library")
+    parser.add_argument("--ephemeris", default = "de421.bsp", help = "ephemeris file for --tle (default: de421.bsp)")
+    parser.add_argument("--virtual", action = "store_true", help = "replay the mission on a virtual clock, without sleeping between the pictures")
+    parser.add_argument("--no-governor", action = "store_true", help = "always analyse the pictures at the full tier, whatever the temperature and the load")
+    return parser.parse_args()
 
 def main():
-    # csv file header
-    header = [
-        "Date[DD/MM/YYYY]",
-        "Time[UTC-24H h:m:s]",
-        "Altitude[m]",
-        "Latitude[Deg]",
-        "Longitude[Deg]",
-        "Yaw[Deg]",
-        "Pitch[Deg]",
-        "Roll[Deg]",
-        "xAcceleration[g]",
-        "yAcceleration[g]",
-        "zAcceleration[g]",
-        "xMag[µT]",
-        "yMag[µT]",
-        "zMag[µT]",
-        "xω[rad/s]",
-        "yω[rad/s]",
-        "zω[rad/s]",
-        "Temperature[°C]",
-        "Pressure[hPa]",
-        "Humidity[%]",
-    ]
+    global groundTrack, ISS, ephemeris, clock
+
+    # with --virtual, the time of the program is the time needed to process the pictures plus the sleeps, which are skipped:
+    # the whole mission is replayed in the time needed by its pictures (the clock waits for the stages of the pipeline before each skip,
+    # and stops at every sample of the SenseHat)
+    args = parseArguments()
+    if (args.virtual):
+        clock = VirtualClock(lambda: idle([analysisQueue, writeQueue, telemetryQueue]))
+
+    # open the hardware (or its replacements)
+    ISS, ephemeris = openOrbit(args.tle, args.ephemeris)
+    sense = openSense(args.sense, clock.monotonic)
 
     # initialise the path to the folder that will contain the pictures
     picsFolder = str(baseFolder) + "/Pictures"
@@ -57,33 +148,70 @@ def main():
     except Exception as e:
         log("FATAL ERROR - unable to find or create Pictures folder: " + str(e))
 
-    # open csv file or create it if it does not exist
+    if (logfile.recovered > 0):
+        log("Incomplete last line removed from \"log.txt\" (" + str(logfile.recovered) + " bytes)")
+
+    # compute the positions of the ISS until the end of the program, so that the orbit is not computed again in the loop
+    # if they cannot be computed, each position is computed when it is needed
     try:
-        datafile = open(str(baseFolder / "data.csv"), "r+", encoding = "utf-8")
-    except:
-        datafile = open(str(baseFolder / "data.csv"), "a+", encoding = "utf-8")
-        log("File \"data.csv\" not found. New copy created")
-
-    datawriter = csv.writer(datafile)
-    # write the header if the file is empty
-    if datafile.read() == "":
-        datawriter.writerow(header)
-        datafile.flush()
-        os.fsync(datafile)
+        duration = (startTime + timedelta(hours = 3) - clock.now()).total_seconds() + groundTrackMargin
+        groundTrack = computeGroundTrack(ISS, ephemeris, duration, groundTrackStep, skyfieldNow(), clock.monotonic())
+        log("Ground track computed: " + str(len(groundTrack.altitude)) + " positions")
+    except Exception as e:
+        log("Error computing the ground track: " + str(e))
+
+    # plan the pictures along the ground track: over land every 'interval' seconds, over the ocean every 'oceanInterval' seconds, none at night
+    # without the ground track, the pictures are taken every 'interval' seconds and the night is checked before each picture
+    planner = None
+    if (groundTrack is not None):
+        try:
+            planner = CapturePlanner(groundTrack, margin = landMargin, oceanInterval = oceanInterval)
+            plan = planner.summary()
+            log("Pictures planned - night: " + str(plan["night"]) + "s, ocean: " + str(plan["ocean"]) + "s, land: " + str(plan["land"]) + "s")
+        except Exception as e:
+            log("Error planning the pictures: " + str(e))
+
+    # open the telemetry files or create them if they do not exist (an incomplete last record is removed)
+    # the rows are saved as binary records of fixed size, and the CSV files are exported from them at the end of the program:
+    # data.bin has a row for every picture saved (data.csv), sense.bin a row every 'telemetryPeriod' seconds (sense.csv)
+    stores = []
+    for name in ["data.bin", "sense.bin"]:
+        if (not os.path.exists(str(baseFolder / name))):
+            log("File \"" + name + "\" not found. New copy created")
+        store = TelemetryStore(str(baseFolder / name), commitInterval, commitRecords)
+        if (store.recovered > 0):
+            log("Incomplete last record removed from \"" + name + "\" (" + str(store.recovered) + " bytes)")
+        stores.append(store)
+    dataStore, telemetryStore = stores
+
+    # initialise the timing of the stages, and open the file of the times of every picture or create it if it does not exist
+    timings = Timings()
+    metrics = MetricsFile(str(baseFolder / "metrics.csv"), metricStages, commitInterval, commitRecords)
+    if (metrics.recovered > 0):
+        log("Incomplete last line removed from \"metrics.csv\" (" + str(metrics.recovered) + " bytes)")
+
+    # result of the start of the segmentation processes
+    if (parallelSegmentation is not None):
+        log("Segmentation processes started: " + str(segmentationProcesses))
+    elif (parallelError is not None):
+        log("Error starting the segmentation processes: " + str(parallelError))
+
+    # start sampling the SenseHat in the background
+    sampler = SenseSampler(sense, senseRate, senseBufferSize, timings, clock)
+    sampler.start()
+    nextSample = 0 # number of the first sample of the next row of sense.csv
 
     try:
         # initialise camera
-        camera = PiCamera()
+        camera = openCamera(args.images, args.full_resolution)
         camera.resolution = (4056, 3040)
         camera.framerate = 24
+        # the pictures are taken into memory, so that only the final cropped pictures are written to the disk
+        memoryCapture = MemoryCapture(camera, quality = 100, timings = timings)
         log("Camera initialised")
     except Exception as e:
         log("Error initialising camera: " + str(e))
 
-    # initialise time and picture timer
-    now = datetime.now()
-    picTime = datetime.now()
-    
     # initialise picture counters
     n = 0 # total number of cycles
     p = 0 # number of pictures taken
@@ -91,278 +219,388 @@ def main():
     # initialise the size of the Pictures folder (...<baseFolder>/Pictures)
     picFolderSize = 0
 
-    # set the initial interval for taking pictures to 3 seconds
-    interval = 3
+    # the shortest interval between the pictures: 3 seconds, or longer if the pictures taken closer would overlap by more than 'downgradeOverlap'
+    # (they would get half of their share of the storage, or be decoded only to be skipped by the analysis stage), at the mean altitude and the lowest speed over the ground of the ground track
+    meanAltitude = float(np.mean(groundTrack.altitude)) if (groundTrack is not None) else nominalAltitude
+    speed = trackSpeed(groundTrack) if (groundTrack is not None) else groundSpeed
+    minimumInterval = captureInterval(downgradeOverlap, meanAltitude, speed)
+    log("Minimum interval: " + str(round(minimumInterval, 2)) + "s [overlap: " + str(round(downgradeOverlap * 100, 1)) + "%, altitude: " + str(int(meanAltitude)) + "m, speed: " + str(int(speed)) + "m/s]")
+
+    # initialise the controller of the storage, which chooses the quality and the resolution of every picture from its content
+    rateController = RateController(storageBudget, minimumInterval, qualityFloor)
+
+    # initialise the footprints of the last pictures kept, to skip the pictures that show the same ground
+    footprints = FootprintHistory(footprintHistory)
+
+    # set the initial interval for taking pictures to the minimum
+    interval = minimumInterval
+
+    # initialise the governor, which lowers the work of the analysis stage when the processor is hot, throttled or overloaded
+    # (the limits of the load allow for the segmentation processes, if they are running)
+    governor = None if args.no_governor else Governor(processes = segmentationProcesses if (parallelSegmentation is not None) else 0)
+
+    # initialise the tracker of the window of the ISS, which is detected once and reused for the following pictures
+    window = WindowTracker()
+
+    # initialise the images used by the segmentation of the pictures and of the thumbnails, which are reused for every picture
+    workspace = SegmentationWorkspace()
+    gateWorkspace = SegmentationWorkspace()
+
+    # PIPELINE
+    # the pictures go through three stages, each one in its own thread, connected by queues of 'queueSize' pictures:
+    #   capture (this thread): takes the picture every 'interval' seconds
+    #   analysis: segments and evaluates the picture, and crops it if it is relevant
+    #   write: saves the cropped picture with its EXIF data and updates the interval
+    # and the data of the SenseHat is saved by the telemetry stage, in its own thread
+    # the camera can therefore take the next picture while the previous one is still being analysed or saved
+    # if the storage is slow, the queues fill up and no picture is taken until the analysis stage has space for it
+
+    def analyse(frame):
+        # analysis stage: returns the frame with the cropped picture if it is relevant, otherwise None
+        image = frame["image"]
+
+        # if the picture shows almost the same ground as one of the last pictures kept, it is not analysed
+        # (the line gives the number of the other picture, not its name, so that the first line with the name of a picture is where it was taken)
+        frame["overlap"], overlapN = footprints.overlap(frame["altitude"], frame["latitude"], frame["longitude"])
+        if (frame["overlap"] > maxOverlap):
+            rateController.observe(False)
+            log("Picture not taken - Overlap [" + str(round(frame["overlap"] * 100, 1)) + "% with picture " + str(overlapN) + "]")
+            endCycle(frame)
+            return None
+
+        # tier of the analysis chosen by the governor: the resolution of the scaled image, and how it is segmented
+        tier = governor.tier() if (governor is not None) else tiers[0]
+
+        # scale down the image to make the following operations faster
+        scalingFactor = tier["scalingFactor"]
+        with timings.measure("resize", frame["timings"]):
+            scaledImage = cv2.resize(image, None, fx = scalingFactor, fy = scalingFactor)
+        print("Picture resized")
+
+        # detect the window of the ISS again if needed
+        with timings.measure("window", frame["timings"]):
+            detected = window.update(scaledImage)
+        if (detected):
+            print("Window detected")
+
+        # first stage: estimate the score on a thumbnail, to reject the pictures that are clearly not relevant (open ocean, clouds)
+        # without segmenting them at full size
+        with timings.measure("gate", frame["timings"]):
+            relevant, score, clouds = relevanceGate(scaledImage, window, workspace = gateWorkspace)
+        stage = "thumbnail"
+        print("Estimated score: " + str(score) + " (clouds: " + str(round(clouds, 1)) + "%)")
+
+        # second stage: segmentation of the scaled picture, only for the pictures that might be relevant
+        # (at the gate tier the estimated score is used, and no picture is segmented at full size)
+        if (relevant and tier["segment"]):
+            # the picture is split between the segmentation processes if they are running,
+            # otherwise pictures with more than 1024 rows (scaling factor above 1/3) are segmented in strips, to limit the memory that is needed
+            # at the light tier the small picture is segmented in this thread, without the blur and the filling of the masks
+            with timings.measure("segmentation", frame["timings"]):
+                if (not tier["smooth"]):
+                    segmented = segmentation(scaledImage, window, workspace, smooth = False)
+                elif (parallelSegmentation is not None):
+                    segmented = parallelSegmentation.segmentation(scaledImage, window)
+                elif (scaledImage.shape[0] > 1024):
+                    segmented = segmentationTiled(scaledImage, window)
+                else:
+                    segmented = segmentation(scaledImage, window, workspace)
+                print("Picture segmented")
+
+                score = evaluate(segmented)
+            stage = "segmentation"
+            print("Score: " + str(score))
+
+        # if the picture is not relevant to our research (there is not enough land), it is not saved
+        if (score < 2.5):
+            rateController.observe(False)
+            log("Picture not taken - Not relevant [" + stage + " score: " + str(round(score, 3)) + ", clouds: " + str(round(clouds, 1)) + "%]")
+            endCycle(frame)
+            return None
+
+        # crop the original image to the window of the ISS to save storage space
+        with timings.measure("crop", frame["timings"]):
+            frame["image"] = cropCircle(scaledImage, image, scalingFactor, window)
+        frame["score"] = score
+        print("Picture cropped")
+
+        # texture of the cropped picture, from which the rate controller predicts the size of the JPEG file
+        # (always at 1/4, whatever the tier, since the texture depends on the resolution)
+        with timings.measure("texture", frame["timings"]):
+            frame["texture"] = texture(cv2.resize(frame["image"], None, fx = 0.25, fy = 0.25))
+        rateController.observe(True)
+        # the footprint is added as soon as the picture is kept, so that the next picture is compared with it whatever the write stage is doing
+        footprints.add(frame["n"], frame["altitude"], frame["latitude"], frame["longitude"])
+        return frame
+
+    def write(frame):
+        # write stage: saves the cropped picture and updates the interval
+        nonlocal p, picFolderSize, interval
+
+        # the remaining time is the initial time plus almost three hours minus the current time
+        # (0 after the deadline, while the stages finish the last pictures: timedelta.seconds would wrap around to almost a day)
+        remainingTime = max(int((startTime + timedelta(hours = 2, minutes = 59) - clock.now()).total_seconds()), 0)
+        # number of pictures that will be taken until the end (with the planner, fewer over the ocean and none at night)
+        capturesLeft = planner.capturesLeft(interval, scheduler.deadline, clock.monotonic()) if (planner is not None) else None
+        if (capturesLeft is None):
+            capturesLeft = remainingTime / max(interval, minimumInterval)
+
+        # choose the JPEG quality and the resolution of the picture, so that its predicted size fits its share of the remaining space
+        # (more for the pictures with a higher score): the picture is not saved only if it does not fit in the remaining space at all
+        pixels = frame["image"].shape[0] * frame["image"].shape[1]
+        # (a picture that overlaps one of the last pictures saved by more than 'downgradeOverlap' gets half of its share)
+        weight = overlapWeight(frame["overlap"], downgradeOverlap)
+        decision = rateController.decide(frame["score"], frame["texture"], pixels, capturesLeft, weight)
+        if (decision is None):
+            log("Picture not saved - Storage full [score: " + str(round(frame["score"], 3)) + "]")
+            footprints.discard(frame["n"])
+            endCycle(frame)
+            return
+        quality, scale, predicted = decision
+
+        # compress the cropped image once (scaled down if needed), with the exif data of the original picture added directly to the JPEG file
+        # (or only the location of the ISS if the original picture has no exif data)
+        with timings.measure("encode", frame["timings"]):
+            image = frame["image"]
+            if (scale < 1):
+                image = cv2.resize(image, None, fx = scale, fy = scale, interpolation = cv2.INTER_AREA)
+            exifData = frame["exif"] if (frame["exif"] is not None) else jpeg.gpsExif(*frame["gps"])
+            try:
+                data = jpeg.encode(image, exifData, quality)
+            except ValueError as e:
+                log("Unable to save EXIF data: " + str(e))
+                data = jpeg.encode(image, None, quality)
+
+        # save the cropped image with its final name
+        picPath = frame["path"]
+        with timings.measure("write", frame["timings"]):
+            with open(picPath, "wb") as picfile:
+                picfile.write(data)
+        print("Picture saved at: " + picPath)
+
+        # increment the number of pictures
+        p += 1
+        # increment the size of the Pictures folder
+        size = os.path.getsize(picPath)
+        picFolderSize += size
+        rateController.update(decision, frame["score"], frame["texture"], pixels, size)
+
+        # update the minimum time interval for taking pictures according to the remaining time and remaining storage space:
+        # given 'remainingSpace' bytes left and 'remainingTime' seconds to save an 'averageSpace' amount of bytes every 'interval' seconds, the following proportion applies:
+        # interval : averageSpace = remainingTime : remainingSpace
+        # therefore -> interval = averageSpace * remainingTime / remainingSpace
+        # the average space is the size predicted for a picture taken at 'qualityFloor' and full resolution, times the fraction of the pictures that are saved
+        # with the planner, only the time over land is taken at this interval (the pictures over the ocean are fewer, and none are taken at night)
+        cost = rateController.captureCost()
+        remainingSpace = rateController.remaining()
+        planned = planner.budgetInterval(cost, remainingSpace, scheduler.deadline, clock.monotonic(), minimumInterval) if ((planner is not None) and (remainingSpace > 0)) else None
+        interval = planned if (planned is not None) else rateController.interval(remainingTime)
+
+        # log the decision of the rate controller, so that it can be replayed offline (python ratecontrol.py log.txt)
+        log(rateController.describe(frame["n"], decision, frame["score"], frame["texture"], pixels, capturesLeft, size, interval, weight))
+
+        # log the coordinates where the pic was taken, and add its row to data.csv
+        # (both with the time when the picture was taken, so that the row of a picture is found from the date and the time of its line)
+        log("Picture " + "\"image_" + str(frame["n"]) + ".jpg\"" + " taken at: (" + str(frame["latitude"]) + ", " + str(frame["longitude"]) + ") [score: " + str(round(frame["score"], 3)) + ", overlap: " + str(round(frame["overlap"] * 100, 1)) + "%]", frame["time"])
+        try:
+            dataStore.append(getPictureData(frame))
+        except Exception as e:
+            log("Error writing data: " + str(e))
+
+        # log the values of the SenseHat nearest to the time when the picture was taken
+        if (frame["sample"] is not None):
+            sampleTime, values = frame["sample"]
+            log("Picture " + "\"image_" + str(frame["n"]) + ".jpg\"" + " sensors [" + str(round((sampleTime - frame["monotonic"]) * 1000)) + "ms]: " + ", ".join(name + " " + formatValue(value) for name, value in zip(channels, values)))
+
+        # log the new time interval
+        log("Time interval: " + str(interval))
+
+        endCycle(frame)
+
+    def endCycle(frame):
+        # logs the time taken by the picture, and writes the times of its stages to metrics.csv
+        log("Time taken: " + str(clock.now() - frame["time"]))
+        metrics.write(frame["n"], frame["monotonic"] - scheduler.start, clock.monotonic() - frame["monotonic"], frame["timings"])
+
+    def saveData(cycle):
+        # telemetry stage: writes the data of the SenseHat since the previous row to sense.bin
+        nonlocal nextSample
+        with timings.measure("telemetry"):
+            row, nextSample = getData(sampler, nextSample)
+            telemetryStore.append(row)
+        log("Succesfully added data")
+
+    def stageError(name, e):
+        # errors of the stages
+        if (name == "telemetry"):
+            log("Error writing data: " + str(e))
+        else:
+            log("Error taking a picture (" + name + "): " + str(e))
+
+    # start the stages
+    analysisQueue = Queue(queueSize)
+    writeQueue = Queue(queueSize)
+    telemetryQueue = Queue(telemetryQueueSize)
+    stages = [
+        Stage("analysis", analyse, analysisQueue, writeQueue, stageError),
+        Stage("write", write, writeQueue, None, stageError)
+    ]
+    telemetry = Stage("telemetry", saveData, telemetryQueue, None, stageError)
+    for stage in stages + [telemetry]:
+        stage.start()
 
-    # run the loop for 2 hours and 59 minutes after start time
-    while (now < (startTime + timedelta(hours = 2, minutes = 59))):
+    def takePicture():
+        # capture: takes a picture (if the ISS is sunlit) and sends it to the analysis stage
+        nonlocal n
 
         # start counting the time for each picture
-        picDeltaTime = datetime.now()
-
-        # take a picture and save data every 'interval' seconds, if interval is bigger than 3
-        # (we have calculated that if we take a picture every 3 seconds, the data limit of 3GB should not be exceeded)
-        if (now >= (picTime + timedelta(seconds = (int(interval) if (interval >= 3) else 3)))):
-            # if it is nighttime, do not take the picture
-            if (ISS.at(load.timescale().now()).is_sunlit(ephemeris)):
-                try:
-                    # temporary picture path
-                    tmpPicPath = picsFolder + "/tmpImage.jpg"
-                    # set the path where the final image will be saved
-                    picPath = picsFolder + "/image_" + str(n) + ".jpg"
-
-                    # locate the ISS
-                    altitude, latitude, longitude = getISSPos()
-
-                    # convert the ISS location to an EXIF-suitable format
-                    south, exifLatitude = convertToExif(latitude)
-                    west, exifLongitude = convertToExif(longitude)
-
-                    # save the location in the metadata of the picture
-                    camera.exif_tags['GPS.GPSAltitude'] = (str(int(altitude)) + "/1")
-                    camera.exif_tags['GPS.GPSLatitude'] = exifLatitude
-                    camera.exif_tags['GPS.GPSLatitudeRef'] = ("S" if south else "N")
-                    camera.exif_tags['GPS.GPSLongitude'] = exifLongitude
-                    camera.exif_tags['GPS.GPSLongitudeRef'] = ("W" if west else "E")
-
-                    # take a picture at full resolution and save it as temporary
-                    camera.capture(tmpPicPath, quality = 100)
-                    print("Tmp picture saved at: " + tmpPicPath)
-
-                    # open the picture as an OpenCV image
-                    image = cv2.imread(tmpPicPath)
-                    print("Tmp picture opened")
-
-                    # scale down the image to make the following operations faster
-                    scalingFactor = 0.25
-                    scaledImage = cv2.resize(image, None, fx = scalingFactor, fy = scalingFactor)
-                    print("Picture resized")
-
-                    # perform image segmentation on the scaled picture
-                    segmented = segmentation(scaledImage)
-                    print("Picture segmented")
-
-                    # if the picture is relevant to our research (there is enough land)...
-                    score = evaluate(segmented)
-                    print("Score: " + str(score))
-                    if (score >= 2.5):
-                        # crop the original image to the window of the ISS to save storage space
-                        image = cropCircle(scaledImage, image, scalingFactor)
-                        print("Picture cropped")
-
-                        # save the cropped image with its final name
-                        cv2.imwrite(picPath, image)
-                        print("Picture saved at: " + picPath)
-
-                        # save the exif data to the final image
-                        try:
-                            # open the temporary image with PIL
-                            tmpImage = Image.open(tmpPicPath)
-                            # get its exif data
-                            exifData = tmpImage.info["exif"]
-                            # open the cropped image with PIL
-                            finalImage = Image.open(picPath)
-                            # save the exif data to the final image
-                            finalImage.save(picPath, exif = exifData)
-                        except Exception as e:
-                            log("Unable to save EXIF data: " + str(e))
-
-                        # increment the number of pictures
-                        p += 1
-                        # increment the size of the Pictures folder
-                        picFolderSize += os.path.getsize(picPath)
-
-                        # update the minimum time interval for taking pictures according to the remaining time and remaining storage space:
-                        # the remaining space is the total space (we went for 2.975GB to leave some wiggle room for safety) minus the current space taken
-                        remainingSpace = 2975000000 - picFolderSize
-                        # the remaining time is the initial time plus almost three hours minus the current time
-                        remainingTime = (startTime + timedelta(hours = 2, minutes = 59) - datetime.now()).seconds
-                        # given 'remainingSpace' bytes left and 'remainingTime' seconds to save an 'averageSpace' amount of bytes every 'interval' seconds, the following proportion applies:
-                        # interval : averageSpace = remainingTime : remainingSpace
-                        # therefore -> interval = averageSpace * remainingTime / remainingSpace
-                        # the average space of one picture is calculated by dividing the total size of the Pictures folder by the number of pictures it contains
-                        interval = ((picFolderSize / p) * remainingTime / remainingSpace)
-
-                        # log the coordinates where the pic was taken
-                        log("Picture " + "\"image_" + str(n) + ".jpg\"" + " taken at: (" + str(latitude) + ", " + str(longitude) + ") [score: " + str(round(score, 3)) + "]")
-
-                        # log the new time interval
-                        log("Time interval: " + str(interval))
-                    else:
-                        log("Picture not taken - Not relevant")
-                    
-                    # print time taken
-                    log("Time taken: " + str(datetime.now() - picDeltaTime))
-                    
-                except Exception as e:
-                    log("Error taking a picture: " + str(e))
-            else:
-                log("Picture not taken - ISS not sunlit")
-
-            # write data to data.csv and log.txt, and make sure the changes are saved
+        picDeltaTime = clock.now()
+        picMonotonic = clock.monotonic()
+
+        # if it is nighttime, do not take the picture
+        if (not isSunlit()):
+            log("Picture not taken - ISS not sunlit")
+        # if not even an average picture fits in the remaining space, do not take the picture (the telemetry is still saved)
+        elif (rateController.full()):
+            log("Picture not taken - Storage full")
+        # if the analysis stage is still busy with the previous pictures, do not take the picture
+        elif (analysisQueue.full()):
+            log("Picture not taken - Previous pictures still being processed")
+        else:
             try:
-                datawriter.writerow(getData())
-                log("Succesfully added data")
+                # locate the ISS
+                altitude, latitude, longitude = getISSPos()
+
+                # convert the ISS location to an EXIF-suitable format
+                south, exifLatitude = convertToExif(latitude)
+                west, exifLongitude = convertToExif(longitude)
+
+                # save the location in the metadata of the picture
+                gps = ((str(int(altitude)) + "/1"), exifLatitude, ("S" if south else "N"), exifLongitude, ("W" if west else "E"))
+                camera.exif_tags['GPS.GPSAltitude'] = gps[0]
+                camera.exif_tags['GPS.GPSLatitude'] = gps[1]
+                camera.exif_tags['GPS.GPSLatitudeRef'] = gps[2]
+                camera.exif_tags['GPS.GPSLongitude'] = gps[3]
+                camera.exif_tags['GPS.GPSLongitudeRef'] = gps[4]
+
+                # take a picture at full resolution into memory, and decode it as an OpenCV image with its exif data
+                # (the times of the stages of the picture are collected in 'cycle', and written to metrics.csv when it is finished)
+                cycle = {}
+                image, exifData = memoryCapture.capture(cycle)
+                print("Picture captured")
+
+                # send the picture to the analysis stage
+                frame = {
+                    "n": n, # number of the cycle
+                    "path": picsFolder + "/image_" + str(n) + ".jpg", # path where the final image will be saved
+                    "image": image,
+                    "exif": exifData,
+                    "gps": gps, # location in the exif format, if the picture has no exif data
+                    "altitude": altitude,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "time": picDeltaTime, # time when the picture was taken
+                    "monotonic": picMonotonic,
+                    "sample": sampler.nearest(picMonotonic), # values of the SenseHat nearest to the time of the picture
+                    "timings": cycle # times of the stages
+                }
+                if (not offer(analysisQueue, frame)):
+                    log("Picture not taken - Previous pictures still being processed")
             except Exception as e:
-                log("Error writing data: " + str(e))
-            
-            # reset picture timer
-            picTime = datetime.now()
-
-            # increment picture counter
-            n += 1
-
-        # update the current time
-        now = datetime.now()
-
-        # if the size of the folder exceeds 2.75GB, stop the program
-        if (picFolderSize >= 2750000000):
-            elapsedTime = str(int((now - startTime).seconds))
-            log("Program aborted after " + elapsedTime + "s: size limit exceeded")
-            break
-    
+                log("Error taking a picture: " + str(e))
+
+        # increment picture counter
+        n += 1
+
+    def pictureInterval():
+        # take a picture every 'interval' seconds, if interval is bigger than the minimum
+        # (we have calculated that if we take a picture every 3 seconds, the data limit of 3GB should not be exceeded, and the pictures closer
+        # than 'minimumInterval' would overlap too much)
+        # the planner waits longer over the ocean and until the end of the night
+        landInterval = max(int(interval), minimumInterval)
+        return planner.delay(landInterval, clock.monotonic()) if (planner is not None) else landInterval
+
+    def sendData():
+        # save the data of the SenseHat to sense.bin
+        if (not offer(telemetryQueue, n)):
+            log("Error writing data: telemetry stage busy")
+
+    def taskError(name, e):
+        # errors of the tasks of the scheduler that are not handled by the tasks themselves
+        log("Error in the " + name + " task: " + str(e))
+
+    def governProcessing():
+        # read the processor, and log the change of tier if there is one
+        transition = governor.update()
+        if (transition is not None):
+            log(transition)
+
+    def housekeeping():
+        # log how late the tasks are starting, how long the stages take and the state of the processor
+        for line in scheduler.report():
+            log("Scheduler - " + line)
+        for line in timings.report():
+            log("Timing - " + line)
+        if (governor is not None):
+            log("Governor - tier " + governor.tier()["name"] + " [" + governor.describe() + "]")
+
+    # SCHEDULER
+    # the tasks run at their own rates until 2 hours and 59 minutes after start time, and the program sleeps in between
+    # (instead of checking the time continuously, which would keep a core busy and take it from the segmentation)
+    # (on the virtual clock, the scheduler drives the time: its sleeps are skipped)
+    # (an error in a task is logged, and the task runs again at its next time)
+    scheduler = Scheduler((startTime + timedelta(hours = 2, minutes = 59) - clock.now()).total_seconds(), clock.monotonic,
+                          lambda seconds: clock.wait(seconds, scheduler.stopEvent, drive = True), taskError)
+    scheduler.every("picture", takePicture, pictureInterval)
+    scheduler.every("telemetry", sendData, telemetryPeriod)
+    scheduler.every("housekeeping", housekeeping, housekeepingPeriod, delay = housekeepingPeriod)
+    if (governor is not None):
+        scheduler.every("governor", governProcessing, governorPeriod)
+    scheduler.run()
+
+    # stop the pipeline: the stages finish the pictures and the data in their queues, all within 'shutdownTime' seconds
+    # (the telemetry stage only gets the time that the pictures have left)
+    shutdownDeadline = clock.monotonic() + shutdownTime
+    unfinished = finish(analysisQueue, stages, shutdownTime)
+    unfinished += finish(telemetryQueue, [telemetry], max(shutdownDeadline - clock.monotonic(), 0))
+    for stage in unfinished:
+        log("Stage " + stage.name + " did not finish in time")
+
+    # log how late the tasks have started and how long the stages have taken during the whole program
+    for line in scheduler.report():
+        log("Scheduler - " + line)
+    for line in timings.report():
+        log("Timing - " + line)
+
     # log the final time in case the program ended correctly after 2h:59m
-    totalTime = datetime.now() - startTime
+    totalTime = clock.now() - startTime
     if (totalTime >= timedelta(hours = 2, minutes = 59)):
         log("Program successfully terminated after " + str(totalTime.seconds) + "s")
 
-    # close camera and files
+    # summary of the mission: pictures kept, storage used and how far from the deadline the program ended
+    # (on the virtual clock, also the real time that the replay has taken)
+    log("Mission summary - cycles: " + str(n) + ", pictures saved: " + str(p) + ", storage used: " + str(picFolderSize) + " bytes ("
+        + str(round(picFolderSize / storageBudget * 100, 1)) + "% of the budget), ended " + str(round(clock.monotonic() - scheduler.deadline, 1)) + "s after the deadline"
+        + ((", governor transitions: " + str(governor.transitions)) if (governor is not None) else "")
+        + ((", replayed in " + str(round(clock.monotonic() - clock.offset() - scheduler.start, 1)) + "s") if args.virtual else ""))
+
+    # close camera, sampler, segmentation processes and files
     camera.close()
-    datafile.close()
+    sampler.stop()
+    if (parallelSegmentation is not None):
+        parallelSegmentation.close()
+    dataStore.close()
+    telemetryStore.close()
+    metrics.close()
+    # export the telemetry to data.csv (a row per picture) and sense.csv (the statistics of the SenseHat)
+    for binName, csvName, stats in [("data.bin", "data.csv", False), ("sense.bin", "sense.csv", True)]:
+        try:
+            exportCsv(loadTelemetry(str(baseFolder / binName)), str(baseFolder / csvName), stats)
+            log("Telemetry exported to \"" + csvName + "\"")
+        except Exception as e:
+            log("Error exporting the telemetry: " + str(e))
     logfile.close()
 
-def segmentation(im):
-    # Image Segmentation
-    # outputs the segmented 'im'
-    # colour classes:
-    #   glaciers + clouds: white
-    #   water: blue
-    #   vegetation: green
-    #   other: red
-
-    # get mask of the round window
-    mk = mask(im) # single channel
-    mk3 = cv2.merge([mk, mk, mk]) # 3 channels
-
-    # remove the parts of the image that are outside of the mask
-    im = np.bitwise_and(im, mk3)
-
-    # separate channels blue, green, red from image and store them into different arrays
-    b, g, r = cv2.split(im)
-    # adjust data type to float
-    b = b.astype(float)
-    g = g.astype(float)
-    r = r.astype(float)
-
-    # NDVI
-    # find the areas covered by vegetation
-    # calculate ndvi value for each pixel
-    # the blue channel contains the infrared value
-    denominator = b + r
-    denominator[denominator == 0] = 0.001
-    ndvi = (b - r)/denominator
-    # blur the image to remove any small artifacts
-    ndvi = cv2.GaussianBlur(ndvi, (5, 5), 0)
-    # remove the parts of the image that are not really land and have a low NDVI
-    _, ndvi = cv2.threshold(ndvi, 0.25, 1, cv2.THRESH_BINARY)
-    # convert it into BGR
-    ndvi = cv2.convertScaleAbs(ndvi, alpha = 255)
-    # fill in the holes of the mask
-    ndvi = fill(ndvi)
-
-    # NDWI
-    # find the oceans and lakes
-    # calculate NDWI value for each pixel
-    # the blue channel contains the infrared value
-    denominator = b + g
-    denominator[denominator == 0] = 0.001 # calculate the denominator separately to check its value and adjust it in case it is zero
-    ndwi = (g - b) / denominator
-    # blur the image to remove any small artifacts
-    ndwi = cv2.GaussianBlur(ndwi, (5, 5), 0)
-    # remove the parts of the image that are not really water and have a low NDWI
-    _, ndwi = cv2.threshold(ndwi, 0.01, 1, cv2.THRESH_BINARY)
-    # convert it into BGR
-    ndwi = cv2.convertScaleAbs(ndwi, alpha = 255)
-    # fill in the holes of the mask
-    ndwi = fill(ndwi)
-
-    # WHITE
-    # extracting the white areas from the original image
-    # 'white' will be used to find glaciers, 'whiteMask' for the rest of the segmentation process
-    # increment the contrast of the image
-    im = contrast(im, 15)
-    # convert the image to grayscale
-    white = cv2.cvtColor(contrast(im), cv2.COLOR_BGR2GRAY)
-    # apply a threshold to the mask in order to select only the brightest pixels
-    _, white = cv2.threshold(white, 232, 255, cv2.THRESH_BINARY)
-    white = cv2.convertScaleAbs(white, alpha = 255)
-    # blur the image to blend the details together
-    whiteMask = cv2.GaussianBlur(white, (7, 7), 0)
-    # increase the definition again
-    _, whiteMask = cv2.threshold(whiteMask, 64, 255, cv2.THRESH_BINARY)
-    # fill in the holes of the mask
-    whiteMask = fill(whiteMask)
-
-    # LAND
-    # detect areas not necessarily covered with vegetation by removing water and anything white from the mask
-    # invert the white parts to get the mask of the areas that are not white = land + water
-    notWhite = cv2.bitwise_not(white)
-    notWhite = cv2.bitwise_and(notWhite, mk, mask = mk)
-    # remove the areas covered in water from the "not white" areas to get the land
-    land = notWhite - ndwi
-
-    # FINAL IMAGE
-    # make an empty image
-    res = np.zeros_like(im)
-    # intersect notWhite and ndwi to get the water only
-    water = cv2.bitwise_and(notWhite, ndwi)
-    # intersect notWhite and land to get the land only
-    other = cv2.bitwise_and(notWhite, land)
-    # intersect notWhite and ndvi to get the vegetation only
-    veget = cv2.bitwise_and(notWhite, ndvi)
-    # remove the vegetation from the water and from the clouds
-    water -= veget
-    water -= other
-    white -= veget
-    # remove the vegetation from the rest of the land
-    other -= veget
-    # convert the white image to 3 channels
-    white = cv2.merge([white, white, white])
-    # water -> blue
-    water = colourise(water, 0, 0, 255)
-    # vegetation -> green
-    veget = colourise(veget, 0, 255, 0)
-    # rest -> red
-    other = colourise(other, 255, 0, 0)
-    # overlay and merge all the masks
-    res = cv2.bitwise_or(white, water, mask = mk)
-    res = cv2.bitwise_or(res, veget, mask = mk)
-    res = cv2.bitwise_or(res, other, mask = mk)
-
-    return res
-
-def evaluate(im):
-    # split the image into the 3 colour channels
-    b, g, r = cv2.split(im)
-
-    # get the total number of pixels in the image
-    totalPixels = im.shape[0] * im.shape[1]
-    
-    # count the number of green pixels, excluding the white pixels
-    greenPixels = np.sum((g != b) & (g != r))
-    # count the number of red pixels, excluding the white pixels
-    redPixels = np.sum((r != b) & (r != g))
-
-    # calculate the percentage of green pixels
-    percentageGreen = greenPixels / totalPixels * 100
-    # calculate the percentage of red pixels
-    percentageRed = redPixels / totalPixels * 100
-
-    # calculate the score of the image [score = 10g% + r%]
-    score = (10 * percentageGreen) + percentageRed
-
-    return score
-
 def convertToExif(angle):
     # get the sign
     sign = angle
@@ -392,250 +630,92 @@ def formatTime(val):
     # adds a 0 before the number in case it is <10
     return (str(val) if (val >= 10) else ("0" + str(val)))
 
-def getDate():
-    # returns current date as dd/mm/yyyy
-    return (formatTime(datetime.now().day) + "/" + formatTime(datetime.now().month) + "/" + formatTime(datetime.now().year))
-
-def getTime():
-    # returns current time as hh:mm:ss.sss
-    return (formatTime(datetime.now().hour) + ":" + formatTime(datetime.now().minute) + ":" + formatTime(datetime.now().second))
-
-def log(msg):
-    # appends a line that indicates the current time and date and the message msg to the file f 
-    message = ("[" + getDate() + "," + getTime() + "] " + msg + "\n")
+def getDate(now = None):
+    # returns current date (or the date of 'now') as dd/mm/yyyy
+    now = clock.now() if (now is None) else now
+    return (formatTime(now.day) + "/" + formatTime(now.month) + "/" + formatTime(now.year))
+
+def getTime(now = None):
+    # returns current time (or the time of 'now') as hh:mm:ss.sss
+    now = clock.now() if (now is None) else now
+    return (formatTime(now.hour) + ":" + formatTime(now.minute) + ":" + formatTime(now.second))
+
+def log(msg, time = None):
+    # appends a line that indicates the current time and date (or 'time') and the message msg to the file f 
+    time = clock.now() if (time is None) else time
+    message = ("[" + getDate(time) + "," + getTime(time) + "] " + msg + "\n")
+    # the line is saved to the disk with the next commit
     logfile.write(message)
-    logfile.flush()
-    os.fsync(logfile)
 
     # print the message to console
     print(message)
 
-def cropCircle(scaledIm, im, scalingFactor):
-    # get the size of the scaled image
-    height, width, _ = scaledIm.shape
-    
-    # get the round mask of the window
-    mk = mask(scaledIm)
-
-    # find contours in the image
-    contours, _ = cv2.findContours(mk, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
-    for contour in contours: # for each contour...
-        # find a circle that fits the contour of the frame of the window
-        (xCentre, yCentre), radius = cv2.minEnclosingCircle(contour)
-        # if the circle is the right size (1/4 height < radius < 2/3 height)
-        if ((radius > (min(height, width) / 4)) and (radius < (min(height, width) / 1.5))):
-            # upscale the circle according to the size of the original image
-            radius /= scalingFactor
-            xCentre /= scalingFactor
-            yCentre /= scalingFactor
-            
-            # calculate the size of the circle
-            size = (2 * int(radius), 2 * int(radius))
-
-            # crop the image to fit the circle that has been found
-            im = cv2.getRectSubPix(im, size, (int(xCentre + 5), int(yCentre)))
-            break
-    # return the original image object
-    # if it has been cropped, the object itself is the cropped image
-    # otherwise, if it has not been cropped, the image is the same
-    return im
-
-def colourise(im, r, g, b):
-    # turns a single channel black and white image into a 3 channel BGR image of a given colour
-
-    # get mask of the white pixels
-    mk = im > 192
-
-    # copy the image in every channel
-    redChannel = im.copy()
-    greenChannel = im.copy()
-    blueChannel = im.copy()
-
-    # set the colour
-    redChannel[mk] = r
-    greenChannel[mk] = g
-    blueChannel[mk] = b
-
-    # create the image with the three channels
-    _, res = cv2.threshold(cv2.merge([blueChannel, greenChannel, redChannel]), 16, 255, cv2.THRESH_BINARY)
-    return res
-
-def mask(im):
-    # convert the image into a PIL image
-    pil_image = Image.fromarray(cv2.cvtColor(im, cv2.COLOR_BGR2RGB))
-
-    # increase contrast
-    enhancer = ImageEnhance.Contrast(pil_image)
-    pil_image = enhancer.enhance(1 + 100 / 100)
-    # increase brightness
-    enhancer = ImageEnhance.Brightness(pil_image)
-    pil_image = enhancer.enhance(100)
-
-    # convert the image back into a cv2 image
-    im = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-
-    # find the pixels that are not white...
-    colours = np.where((im[:, :, 0] != 255) | (im[:, :, 1] != 255) | (im[:, :, 2] != 255))
-    # ...and set them to black
-    im[colours] = [0, 0, 0]
-
-    # convert the image into grayscale
-    grey = cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
-
-    # apply a threshold to make sure that the picture is only black and white
-    _, grey = cv2.threshold(grey, 10, 255, cv2.THRESH_BINARY)
-
-    # fill up any holes in the mask
-    grey = fill(grey)
-
-    return grey
-
-def fill(im):
-    # make a copy of the current image
-    mk = im.copy()
-
-    # make a slightly bigger mask (two pixels)
-    im2 = np.zeros((im.shape[0] + 2, im.shape[1] + 2), dtype = np.uint8)
-
-    # fill the copy of the mask from the top-left and bottom-right corners
-    cv2.floodFill(im, im2, (0, 0), 255, 0, 0)
-    cv2.floodFill(im, im2, (im.shape[1] - 1, im.shape[0] - 1), 255, 0, 0)
-
-    # invert it (it is all white except the parts that have to be)
-    im = np.invert(im)
-
-    # add the filled area to the image to fill up any black patches
-    return cv2.bitwise_or(im, mk)
-
-def contrast(im, k = 75):
-    #increases contrast, sharpness, brightness. The default contrast value is 75
-    
-    # convert cv2 image to PIl image
-    pil_image = Image.fromarray(cv2.cvtColor(im, cv2.COLOR_BGR2RGB))
-
-    # contrast
-    enhancer = ImageEnhance.Contrast(pil_image)
-    pil_image = enhancer.enhance(1 + k / 100)
+def skyfieldNow():
+    # returns the current time of the clock as a skyfield time
+    timescale = load.timescale()
+    return timescale.tt_jd(timescale.now().tt + clock.offset() / 86400)
 
-    # sharpness
-    enhancer = ImageEnhance.Sharpness(pil_image)
-    pil_image = enhancer.enhance(1)
-
-    # brightness
-    enhancer = ImageEnhance.Brightness(pil_image)
-    pil_image = enhancer.enhance(1)
-
-    # convert PIL image into cv2 image
-    im = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-    return im
+def isSunlit():
+    # returns True if the ISS is in sunlight now, from the ground track (or computing it, if the ground track does not cover now)
+    now = clock.monotonic()
+    if ((groundTrack is not None) and groundTrack.covers(now)):
+        return groundTrack.isSunlit(now)
+    return ISS.at(skyfieldNow()).is_sunlit(ephemeris)
 
 def getISSPos():
-    # get current ISS location
-    loc = ISS.at(load.timescale().now()).subpoint()
+    # get current ISS location, from the ground track if it covers now
+    now = clock.monotonic()
+    if ((groundTrack is not None) and groundTrack.covers(now)):
+        return groundTrack.position(now)
+    loc = ISS.at(skyfieldNow()).subpoint()
 
     # return the altitude in meters, and latitude and longitude in degrees
     return (loc.elevation.m, loc.latitude.degrees, loc.longitude.degrees)
 
-def getData():
-    senseData = []
+def getData(sampler, first):
+    # returns the record of the telemetry with the values of the SenseHat from the sample number 'first', and the number of the next sample
+    row = newRecord()
+    row["monotonic"] = clock.monotonic()
 
-    # get date [DD/MM/YYYY]
+    # get date and time
     try:
-        senseData.append(getDate())
-    except Exception as e:
-        log("ERROR getting date: " + str(e))
-        senseData.append("-")
-
-    # get UTC time [hh:mm:ss]
-    try:
-        senseData.append(getTime())
+        row["time"] = clock.now().timestamp()
+        row["valid"] |= validTime
     except Exception as e:
         log("ERROR getting time: " + str(e))
-        senseData.append("-")
 
     # get current coordinates [Deg] and altitude [m] of the ISS
     try:
         # find where the ISS is now
         altitude, latitude, longitude = getISSPos()
-        senseData.append(str(int(altitude)))
-        senseData.append(str(latitude))
-        senseData.append(str(longitude))
+        row["altitude"], row["latitude"], row["longitude"] = altitude, latitude, longitude
+        row["valid"] |= validPosition
     except Exception as e:
         log("ERROR getting ISS location: " + str(e))
-        senseData.append("-")
-        senseData.append("-")
-        senseData.append("-")
-
-    # get orientation [Deg]
-    try:
-        orientation = sense.get_orientation()
-        senseData.append(str(orientation["yaw"]))
-        senseData.append(str(orientation["pitch"]))
-        senseData.append(str(orientation["roll"]))
-    except Exception as e:
-        log("Compass ERROR: " + str(e))
-        senseData.append("-")
-        senseData.append("-")
-        senseData.append("-")
-
-    # get acceleration [g]
-    try:
-        acceleration = sense.get_accelerometer_raw()
-        senseData.append(str(acceleration["x"]))
-        senseData.append(str(acceleration["y"]))
-        senseData.append(str(acceleration["z"]))
-    except Exception as e:
-        log("Accelerometer ERROR: " + str(e))
-        senseData.append("-")
-        senseData.append("-")
-        senseData.append("-")
-
-    # get magnetic field intensity
-    try:
-        mag = sense.get_compass_raw()
-        senseData.append(str(mag["x"]))
-        senseData.append(str(mag["y"]))
-        senseData.append(str(mag["z"]))
-    except Exception as e:
-        log("Compass ERROR: " + str(e))
-        senseData.append("-")
-        senseData.append("-")
-        senseData.append("-")
-
-    # get angular velocity
-    try:
-        gyro = sense.get_gyroscope_raw()
-        senseData.append(str(gyro["x"]))
-        senseData.append(str(gyro["y"]))
-        senseData.append(str(gyro["z"]))
-    except Exception as e:
-        log("Gyro ERROR: " + str(e))
-        senseData.append("-")
-        senseData.append("-")
-        senseData.append("-")
-
-    # get temperature [°C]
-    try:
-        senseData.append(str(sense.get_temperature()))
-    except Exception as e:
-        log("Thermometer ERROR: " + str(e))
-        senseData.append("-")
-
-    # get pressure [mbar = hPa]
-    try:
-        senseData.append(str(sense.get_pressure()))
-    except Exception as e:
-        log("Barometer ERROR: " + str(e))
-        senseData.append("-")
-
-    # get humidity [%]
-    try:
-        senseData.append(str(sense.get_humidity()))
-    except Exception as e:
-        log("Humidity ERROR: " + str(e))
-        senseData.append("-")
 
-    return senseData
+    # get the samples of the SenseHat taken since the previous row: orientation [Deg], acceleration [g], magnetic field intensity [µT],
+    # angular velocity [rad/s], temperature [°C], pressure [mbar = hPa] and humidity [%]
+    samples, nextSample = sampler.window(first)
+    for name, error in sampler.takeErrors().items():
+        log(name + " ERROR: " + error)
+
+    # their means, their number, their minimums and their maximums
+    setSense(row, samples)
+
+    return row, nextSample
+
+def getPictureData(frame):
+    # returns the record of the telemetry of the picture 'frame': the time and the position of the ISS when it was taken,
+    # and the values of the SenseHat in the sample nearest to that time
+    row = newRecord()
+    row["monotonic"] = frame["monotonic"]
+    row["time"] = frame["time"].timestamp()
+    row["valid"] |= validTime
+    row["altitude"], row["latitude"], row["longitude"] = frame["altitude"], frame["latitude"], frame["longitude"]
+    row["valid"] |= validPosition
+    samples = frame["sample"][1][np.newaxis] if (frame["sample"] is not None) else np.zeros((0, len(channels)))
+    setSense(row, samples)
+    return row
 
 # call the main function
 main()
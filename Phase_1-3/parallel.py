@@ -0,0 +1,133 @@
+from multiprocessing import Pool, shared_memory, resource_tracker
+import numpy as np
+import cv2
+import vision
+import enhance
+
+# segmentation of the pictures on several processes (the Raspberry Pi 4 has 4 cores)
+# the picture, the mask of the window and the bits of the classes are kept in shared memory: the picture is copied there once,
+# and the processes only receive the names of the memory blocks and the rows they have to work on, so no image is ever pickled
+# each process works on a horizontal band of the picture (reading the rows of the halo needed by the blur from the bands next to it),
+# then the holes of the NDWI and NDVI masks are filled on the whole picture, since they can be connected across the bands
+# the label map is exactly the same as the one of vision.segmentation()
+# the images of the bands (in the processes) and of the filling of the holes (in the main process) are allocated once, and again only
+# if the size of the pictures changes
+# the pool has to be created before the program starts any thread: on Linux the processes are forked, and a process forked from a
+# process with threads can block on a lock that one of them was holding
+
+# images in shared memory that have been opened by the process, by the names of the memory blocks
+attached = {}
+# images of the bands of the pictures of the current size, by the size of the band (see vision.stripWorkspace())
+workspaces = {}
+
+def attach(names, height, width):
+    # returns the picture, the mask and the bits in the shared memory blocks 'names', opening them the first time
+    if (names not in attached):
+        # the size of the pictures has changed: close the old blocks (after removing the images that use them)
+        old = [block for blocks, _ in attached.values() for block in blocks]
+        attached.clear()
+        workspaces.clear()
+        for block in old:
+            block.close()
+
+        blocks = [shared_memory.SharedMemory(name = name) for name in names]
+        images = (
+            np.ndarray((height, width, 3), dtype = np.uint8, buffer = blocks[0].buf), # picture
+            np.ndarray((height, width), dtype = np.uint8, buffer = blocks[1].buf), # mask of the window
+            np.ndarray((height, width), dtype = np.uint8, buffer = blocks[2].buf) # bits of the classes
+        )
+        attached[names] = (blocks, images)
+    return attached[names][1]
+
+def greySumTask(names, height, width, top, bottom, lut):
+    # sum of the grey values of a band of the masked picture (after the lookup table 'lut' if there is one)
+    im, mk, _ = attach(names, height, width)
+    return vision.stripGreySum(im, mk, top, bottom, lut, workspaces)
+
+def bitsTask(names, height, width, top, bottom, whiteLut):
+    # bits of the classes of a band of the picture, written directly into the shared memory
+    im, mk, bits = attach(names, height, width)
+    vision.stripBits(im, mk, bits, top, bottom, whiteLut, workspaces)
+
+class ParallelSegmentation:
+    # pool of processes that segment the pictures in bands
+    # the shared memory is allocated the first time a picture is segmented, and again only if the size of the pictures changes
+    # close() must be called at the end, to stop the processes and free the shared memory
+
+    def __init__(self, processes = 4):
+        self.processes = processes # number of processes (and of bands)
+        # start the tracker of the shared memory before the processes, so that they use the same one: otherwise each process
+        # would start its own tracker, which would delete the shared memory when the process ends
+        resource_tracker.ensure_running()
+        self.pool = Pool(processes)
+        self.blocks = [] # shared memory blocks: picture, mask of the window, bits of the classes
+        self.height, self.width = 0, 0
+
+    def prepare(self, height, width):
+        # make sure that the shared memory has the size of the picture
+        if ((height, width) == (self.height, self.width)):
+            return
+        self.freeMemory()
+        self.height, self.width = height, width
+
+        self.blocks = [
+            shared_memory.SharedMemory(create = True, size = height * width * 3),
+            shared_memory.SharedMemory(create = True, size = height * width),
+            shared_memory.SharedMemory(create = True, size = height * width)
+        ]
+        self.names = tuple(block.name for block in self.blocks)
+        self.image = np.ndarray((height, width, 3), dtype = np.uint8, buffer = self.blocks[0].buf)
+        self.mask = np.ndarray((height, width), dtype = np.uint8, buffer = self.blocks[1].buf)
+        self.bits = np.ndarray((height, width), dtype = np.uint8, buffer = self.blocks[2].buf)
+        # images of the main process: the mask of a bit and the mask of the flood fill (to fill the holes), and the label map
+        # (the label map is overwritten by the next picture)
+        self.plane = np.empty((height, width), dtype = np.uint8)
+        self.floodMask = np.empty((height + 2, width + 2), dtype = np.uint8)
+        self.labels = np.empty((height, width), dtype = np.uint8)
+
+    def segmentation(self, im, window = None):
+        # returns the label map of 'im', like vision.segmentation(im, window)
+        height, width = im.shape[:2]
+        self.prepare(height, width)
+
+        # copy the picture and the mask of the window into the shared memory
+        np.copyto(self.image, im)
+        np.copyto(self.mask, window.getMask(im) if (window is not None) else vision.mask(im))
+
+        # split the picture into one band of rows for each process
+        edges = np.linspace(0, height, self.processes + 1).astype(int)
+        bands = [(self.names, height, width, top, bottom) for top, bottom in zip(edges[:-1], edges[1:]) if (bottom > top)]
+
+        # WHITE
+        # the two contrast changes depend on the mean grey value of the whole masked picture, so the bands are added up first
+        pixels = height * width
+        total = sum(self.pool.starmap(greySumTask, [band + (None,) for band in bands]))
+        firstLut = enhance.contrastLut(enhance.roundMean(total, pixels), 1 + 15 / 100)
+        total = sum(self.pool.starmap(greySumTask, [band + (firstLut,) for band in bands]))
+        whiteLut = enhance.contrastLut(enhance.roundMean(total, pixels), 1 + 75 / 100)[firstLut]
+
+        # bits of the classes of every band, with the NDVI and NDWI (the slowest part)
+        self.pool.starmap(bitsTask, [band + (whiteLut,) for band in bands])
+
+        # fill the holes of the NDWI and NDVI masks on the whole picture, since they can be connected across the bands
+        vision.fillBit(self.bits, 4, self.plane, self.floodMask)
+        vision.fillBit(self.bits, 8, self.plane, self.floodMask)
+
+        # convert the bits into the classes
+        return cv2.LUT(self.bits, vision.classLut, dst = self.labels)
+
+    def freeMemory(self):
+        # free the shared memory (after removing the images that use it)
+        self.image, self.mask, self.bits = None, None, None
+        self.plane, self.floodMask, self.labels = None, None, None
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+        self.height, self.width = 0, 0
+
+    def close(self):
+        # stop the processes and free the shared memory
+        self.pool.close()
+        self.pool.join()
+        self.freeMemory()
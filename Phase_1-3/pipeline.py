@@ -0,0 +1,75 @@
+from queue import Full
+from threading import Thread
+from time import monotonic
+
+# stages of a pipeline that run in their own threads, connected by bounded queues
+# each stage takes the items from its queue one by one, and puts its results into the queue of the next stage:
+# if a stage is slower than the previous one (for example when writing to the storage stalls), its queue fills up and the
+# previous stage waits before putting a new item, until the first stage, which can check it with offer(), stops adding new items
+# the pipeline is stopped by putting 'end' into the first queue: each stage finishes the items before it and passes it on
+
+# item that stops the stages
+end = object()
+
+class Stage(Thread):
+    # thread that passes every item of 'inbox' to 'work', and puts the result (if it is not None) into 'outbox'
+    # the errors of 'work' are passed to 'onError(name, error)' and the stage goes on with the next item
+
+    def __init__(self, name, work, inbox, outbox = None, onError = None):
+        # the thread does not keep the program running if it cannot be stopped
+        Thread.__init__(self, name = name, daemon = True)
+        self.work = work
+        self.inbox = inbox
+        self.outbox = outbox
+        self.onError = onError
+
+    def run(self):
+        while True:
+            item = self.inbox.get()
+            if (item is end):
+                # pass the end on to the next stage, after all the items before it
+                if (self.outbox is not None):
+                    self.outbox.put(end)
+                self.inbox.task_done()
+                return
+
+            try:
+                result = self.work(item)
+            except Exception as e:
+                if (self.onError is not None):
+                    self.onError(self.name, e)
+                result = None
+
+            # wait until the next stage has space for the result
+            if ((result is not None) and (self.outbox is not None)):
+                self.outbox.put(result)
+            # the item is done only when its result is in the next queue, so that idle() never misses an item between two stages
+            self.inbox.task_done()
+
+def offer(queue, item):
+    # puts 'item' into 'queue' only if there is space, returns False if the queue is full
+    try:
+        queue.put_nowait(item)
+        return True
+    except Full:
+        return False
+
+def idle(queues):
+    # returns True if every item put into the queues has been processed by its stage
+    for queue in queues:
+        with queue.mutex:
+            if (queue.unfinished_tasks > 0):
+                return False
+    return True
+
+def finish(queue, stages, timeout):
+    # stops the pipeline that starts with 'queue', waiting at most 'timeout' seconds for its 'stages' to finish
+    # returns the stages that have not finished in time
+    deadline = monotonic() + timeout
+    try:
+        queue.put(end, timeout = timeout)
+    except Full:
+        pass
+    for stage in stages:
+        stage.join(max(deadline - monotonic(), 0))
+    return [stage for stage in stages if stage.is_alive()]
@@ -0,0 +1,174 @@
+from pathlib import Path
+from time import monotonic
+import argparse
+import numpy as np
+
+# planning of the pictures from the ground track of the ISS
+# the pictures over the open ocean and at night are almost never relevant (evaluate() gives them a low score), and this can be known
+# before taking them: the planner looks up every position of the ground track in a low resolution land mask (landmask.txt), and marks
+# every step of the ground track as night, ocean or land. The pictures are then taken every 'interval' seconds over land, only every
+# 'oceanInterval' seconds over the ocean (to still catch the islands and the coasts that the mask is too coarse to see), and not at night.
+# Since only the land passes use the storage at the full rate, the interval that fills the storage by the end of the program is
+# calculated from the time that will be spent over land, instead of from the whole remaining time.
+
+# kinds of the steps of the ground track
+night = 0
+ocean = 1
+land = 2
+
+def loadLandMask(path = Path(__file__).parent / "landmask.txt"):
+    # returns the land mask: a boolean array with one row for every band of latitudes from 90° to -90°, and one column for every band
+    # of longitudes from -180° to 180°, True where there is land ('#' in the file, '.' for the sea)
+    with open(path, "r", encoding = "utf-8") as maskfile:
+        rows = [line.strip() for line in maskfile if (line.strip() != "")]
+    return np.array([[char == "#" for char in row] for row in rows], dtype = bool)
+
+def isLand(mask, latitude, longitude, margin = 0):
+    # returns True where the points (arrays of latitudes and longitudes in degrees) are over land in the mask,
+    # or less than 'margin' degrees away from it
+    latitude = np.asarray(latitude, dtype = np.float64)
+    longitude = np.asarray(longitude, dtype = np.float64)
+    rows, columns = mask.shape
+    result = np.zeros(np.broadcast(latitude, longitude).shape, dtype = bool)
+    # check the point and the four points at 'margin' degrees from it
+    for dLatitude, dLongitude in [(0, 0), (margin, 0), (-margin, 0), (0, margin), (0, -margin)]:
+        row = np.clip(((90 - (latitude + dLatitude)) / 180 * rows).astype(int), 0, rows - 1)
+        column = (((longitude + dLongitude + 180) % 360) / 360 * columns).astype(int) % columns
+        result |= mask[row, column]
+    return result
+
+class CapturePlanner:
+    # plan of the pictures along the ground track 'track' (a GroundTrack)
+
+    def __init__(self, track, mask = None, margin = 2, oceanInterval = 30):
+        self.track = track
+        self.mask = loadLandMask() if (mask is None) else mask
+        self.oceanInterval = oceanInterval # seconds between the pictures over the ocean
+        # kind of every step of the ground track
+        self.kinds = np.where(isLand(self.mask, track.latitude, track.longitude, margin), land, ocean)
+        self.kinds[~track.sunlit] = night
+        self.kinds = self.kinds.astype(np.uint8)
+
+        # for every step, the next step over land in daylight and the next step in daylight (len(kinds) if there is none)
+        # found by going through the steps backwards with a cumulative minimum
+        steps = np.arange(len(self.kinds))
+        never = len(self.kinds)
+        self.nextLand = np.minimum.accumulate(np.where(self.kinds == land, steps, never)[::-1])[::-1]
+        self.nextDay = np.minimum.accumulate(np.where(self.kinds != night, steps, never)[::-1])[::-1]
+
+        # number of seconds over land and over the ocean in daylight after every step, for the storage budget
+        self.landAfter = np.cumsum((self.kinds == land)[::-1])[::-1] * track.step
+        self.oceanAfter = np.cumsum((self.kinds == ocean)[::-1])[::-1] * track.step
+
+    def step(self, time):
+        # returns the step of the ground track nearest to the monotonic time 'time', or None if it is not in the ground track
+        if (not self.track.covers(time)):
+            return None
+        return int(round((time - self.track.origin) / self.track.step))
+
+    def kind(self, time = None):
+        # returns the kind (night, ocean or land) of the position of the ISS at the monotonic time 'time' (now by default),
+        # or None if it is not in the ground track
+        i = self.step(monotonic() if (time is None) else time)
+        return None if (i is None) else int(self.kinds[i])
+
+    def delay(self, interval, time = None):
+        # returns the seconds from 'time' (now by default) until the next picture, when the pictures are taken every 'interval' seconds
+        # over land: after 'interval' seconds if the ISS will be over land, otherwise when it will reach land, or after 'oceanInterval'
+        # seconds over the ocean, or when the night will end
+        time = monotonic() if (time is None) else time
+        i = self.step(time + interval)
+        if (i is None):
+            return interval
+        if (self.kinds[i] == land):
+            return interval
+        if (self.kinds[i] == ocean):
+            target = min(self.nextLand[i], i + int(round(max(self.oceanInterval - interval, 0) / self.track.step)))
+        else:
+            target = i
+        if ((target < len(self.kinds)) and (self.kinds[target] == night)):
+            # wait for the end of the night
+            target = min(self.nextLand[target], self.nextDay[target])
+        if (target >= len(self.kinds)):
+            # no more daylight in the ground track: wait until its end
+            return max(self.track.end - time, interval)
+        return max(self.track.origin + target * self.track.step - time, interval)
+
+    def remainingTimes(self, end, time = None):
+        # returns the seconds over land and over the ocean in daylight from 'time' (now by default) to the monotonic time 'end',
+        # or None if the ground track does not cover the time from now to the end
+        time = monotonic() if (time is None) else time
+        i = self.step(time)
+        last = self.step(end)
+        if ((i is None) or (last is None)):
+            return None
+        landTime = self.landAfter[i] - (self.landAfter[last + 1] if (last + 1 < len(self.kinds)) else 0)
+        oceanTime = self.oceanAfter[i] - (self.oceanAfter[last + 1] if (last + 1 < len(self.kinds)) else 0)
+        return landTime, oceanTime
+
+    def capturesLeft(self, interval, end, time = None):
+        # returns the number of pictures that will be taken until the monotonic time 'end' every 'interval' seconds over land,
+        # or None if the ground track does not cover the time from now to the end
+        times = self.remainingTimes(end, time)
+        if (times is None):
+            return None
+        landTime, oceanTime = times
+        return float(landTime / max(interval, 1) + oceanTime / self.oceanInterval)
+
+    def budgetInterval(self, averageSize, remainingSpace, end, time = None, minimum = 3):
+        # returns the interval between the pictures over land so that 'remainingSpace' bytes are filled with pictures of 'averageSize' bytes
+        # by the monotonic time 'end', or None if the ground track does not cover the time from now to the end
+        # the number of pictures left is landTime / interval + oceanTime / oceanInterval, so:
+        # interval = landTime / (remainingSpace / averageSize - oceanTime / oceanInterval)
+        times = self.remainingTimes(end, time)
+        if (times is None):
+            return None
+        landTime, oceanTime = times
+        pictures = remainingSpace / averageSize - oceanTime / self.oceanInterval
+        if (pictures <= 0):
+            # the storage is not even enough for the pictures over the ocean: take the pictures over land as rarely as possible
+            return float(max(landTime, minimum))
+        return max(landTime / pictures, minimum)
+
+    def summary(self):
+        # returns the seconds of the ground track at night, over the ocean and over land
+        return {name: int(np.count_nonzero(self.kinds == kind)) * self.track.step for name, kind in [("night", night), ("ocean", ocean), ("land", land)]}
+
+def main():
+    # plans the pictures of a ground track computed offline from a recorded TLE, without the Astro Pi
+    # example: python planner.py iss.tle de421.bsp --start 2023-05-05T10:00:00 --hours 3
+    from skyfield.api import load
+    from datetime import datetime, timezone
+    from groundtrack import computeGroundTrack
+    from backends import loadTLE
+
+    parser = argparse.ArgumentParser(description = "Plan the pictures along the ground track of a recorded TLE")
+    parser.add_argument("tle", help = "file with the TLE of the ISS (the two lines of the elements, optionally after its name)")
+    parser.add_argument("ephemeris", help = "ephemeris file (for example de421.bsp)")
+    parser.add_argument("--start", help = "start time in UTC, in ISO format (default: the epoch of the TLE)")
+    parser.add_argument("--hours", type = float, default = 3, help = "hours of the program (default: 3)")
+    parser.add_argument("--interval", type = float, default = 3, help = "seconds between the pictures over land (default: 3)")
+    args = parser.parse_args()
+
+    timescale = load.timescale()
+    satellite = loadTLE(args.tle, timescale)
+    if (args.start is not None):
+        start = timescale.from_datetime(datetime.fromisoformat(args.start).replace(tzinfo = timezone.utc))
+    else:
+        start = satellite.epoch
+    track = computeGroundTrack(satellite, load(args.ephemeris), args.hours * 3600, start = start)
+    planner = CapturePlanner(track)
+
+    # simulate the pictures of the whole program, as the main loop would take them
+    time = track.origin
+    pictures = {night: 0, ocean: 0, land: 0}
+    while (time < track.end):
+        pictures[planner.kind(time)] += 1
+        time += planner.delay(args.interval, time)
+
+    print("Seconds at night, over the ocean and over land: " + str(planner.summary()))
+    print("Planned pictures over the ocean: " + str(pictures[ocean]) + ", over land: " + str(pictures[land]) + ", at night: " + str(pictures[night]))
+    print("Pictures without the planner: " + str(int(args.hours * 3600 / args.interval)))
+
+if __name__ == "__main__":
+    main()
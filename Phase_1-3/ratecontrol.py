@@ -0,0 +1,204 @@
+from threading import Lock
+import argparse
+import re
+import numpy as np
+import cv2
+
+# control of the storage used by the pictures
+# instead of only waiting longer between the pictures when they are bigger than expected, the controller predicts the size of every
+# picture from its content, and chooses its JPEG quality and its resolution so that the whole budget is used by the end of the program:
+# - the size of a picture is predicted from its number of pixels and its texture (the mean absolute Laplacian of the scaled picture,
+#   since the detailed pictures need more bits per pixel), with a model for each quality that is corrected by the sizes of the pictures
+#   that have already been saved
+# - the bytes left are divided by the number of pictures that are expected to be saved (the captures left times the fraction of the
+#   pictures that are relevant), and the pictures with a higher score get more bytes
+# - every picture is saved with the best quality and resolution whose predicted size fits its share, going below 'qualityFloor'
+#   only at half resolution; the interval between the pictures is the shortest one that fits the budget at 'qualityFloor'
+# every decision is written to the log with its inputs, so that it can be replayed offline with replay() (python ratecontrol.py log.txt)
+
+# qualities and resolutions (scaling factors of the cropped picture) that can be chosen
+qualities = [95, 85, 75, 65, 55]
+scales = [1.0, 0.75, 0.5]
+
+# bits per pixel of a picture with texture t saved with quality q: bitsA[q] + bitsB[q] * t
+# (least squares fit on the pictures in the repository; the correction factor adapts it to the pictures taken on the ISS)
+bitsA = {95: 1.08, 85: 0.53, 75: 0.33, 65: 0.28, 55: 0.22}
+bitsB = {95: 0.038, 85: 0.031, 75: 0.027, 65: 0.025, 55: 0.022}
+# the pictures that are scaled down need more bits per pixel, since their details are closer to each other
+scaleBits = {1.0: 1.0, 0.75: 1.15, 0.5: 1.3}
+
+def texture(im):
+    # returns the texture of the BGR image 'im' (the mean absolute Laplacian of its grey values)
+    grey = cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
+    return float(cv2.mean(cv2.convertScaleAbs(cv2.Laplacian(grey, cv2.CV_16S)))[0])
+
+def rawSize(pixels, texture, quality, scale):
+    # returns the size in bytes predicted by the model, before the correction
+    return pixels * scale * scale * (bitsA[quality] + bitsB[quality] * texture) * scaleBits[scale] / 8
+
+class RateController:
+    # controller of the 'budget' bytes of the pictures
+    # observe() is called by the analysis stage for every picture, decide() and update() by the write stage for the pictures that are saved
+
+    def __init__(self, budget, minimumInterval = 3, qualityFloor = 75, smoothing = 0.1, reserve = 0.02):
+        self.budget = budget
+        self.minimumInterval = minimumInterval
+        self.qualityFloor = qualityFloor
+        self.smoothing = smoothing # weight of the last picture in the running means
+        self.reserve = reserve # fraction of the budget that is never planned (a safety margin for the errors of the predictions)
+        self.used = 0 # bytes saved
+        self.captures = 0 # pictures analysed
+        self.kept = 0 # pictures saved
+        self.correction = 1.0 # running mean of the ratio between the real and the predicted sizes
+        self.meanScore = None # running means of the pictures that are saved
+        self.meanTexture = None
+        self.meanPixels = None
+        self.counts = (0, 0) # pictures analysed and saved when the last decision was taken (for the log)
+        self.lock = Lock()
+
+        # options in order of preference: every quality down to 'qualityFloor' at full resolution, then at the lower resolutions,
+        # and finally the lower qualities at the lowest resolution
+        self.options = [(quality, scale) for scale in scales for quality in qualities if (quality >= qualityFloor)]
+        self.options += [(quality, scales[-1]) for quality in qualities if (quality < qualityFloor)]
+
+    def observe(self, kept):
+        # counts a picture that has been analysed, and whether it is relevant
+        with self.lock:
+            self.captures += 1
+            if (kept):
+                self.kept += 1
+
+    def predict(self, pixels, texture, quality, scale):
+        # returns the predicted size in bytes of a picture
+        return rawSize(pixels, texture, quality, scale) * self.correction
+
+    def remaining(self):
+        # returns the bytes left in the budget, without the reserve
+        return self.budget * (1 - self.reserve) - self.used
+
+    def keepRate(self):
+        # returns the fraction of the pictures that are saved (1 before the first picture, to be careful)
+        return (self.kept / self.captures) if (self.kept > 0) else 1.0
+
+    def decide(self, score, texture, pixels, capturesLeft, weight = 1):
+        # returns the (quality, scale, predicted size) of a picture with the given score, texture and number of pixels,
+        # when 'capturesLeft' more pictures are expected to be taken, or None if the picture does not fit in the budget any more
+        # the share of the picture is multiplied by 'weight' (less than 1 for a picture that is less useful, like one that overlaps the previous ones)
+        with self.lock:
+            self.counts = (self.captures, self.kept)
+            remaining = self.remaining()
+            # share of the bytes left of every picture that is expected to be saved (this one included)
+            share = remaining / max(capturesLeft * self.keepRate(), 1)
+            # the pictures with a higher score get more bytes
+            if (self.meanScore is not None):
+                share *= min(max(score / self.meanScore, 0.5), 2)
+            share *= weight
+
+            for quality, scale in self.options:
+                predicted = self.predict(pixels, texture, quality, scale)
+                if (predicted <= share):
+                    break
+            # the last option is the smallest one: it is used if the picture does not fit its share, as long as it fits in the budget
+            if (predicted > remaining):
+                return None
+            return quality, scale, predicted
+
+    def update(self, decision, score, texture, pixels, size):
+        # adds a saved picture of 'size' bytes, with the (quality, scale, predicted size) chosen by decide()
+        quality, scale, predicted = decision
+        with self.lock:
+            self.used += size
+            # correct the model with the real size (the ratio is limited, so that a single unusual picture does not change it too much)
+            ratio = min(max(size / max(rawSize(pixels, texture, quality, scale), 1), 0.25), 4)
+            self.correction += (ratio - self.correction) * self.smoothing
+            if (self.meanScore is None):
+                self.meanScore, self.meanTexture, self.meanPixels = score, texture, pixels
+            else:
+                self.meanScore += (score - self.meanScore) * self.smoothing
+                self.meanTexture += (texture - self.meanTexture) * self.smoothing
+                self.meanPixels += (pixels - self.meanPixels) * self.smoothing
+
+    def full(self):
+        # returns True if not even an average picture fits in the budget with the smallest option
+        with self.lock:
+            if (self.meanPixels is None):
+                return (self.remaining() <= 0)
+            quality, scale = self.options[-1]
+            return (self.predict(self.meanPixels, self.meanTexture, quality, scale) > self.remaining())
+
+    def captureCost(self):
+        # returns the bytes that every picture taken is expected to use at 'qualityFloor' and full resolution
+        # (the pictures that are not relevant are not saved, so they cost nothing)
+        with self.lock:
+            if (self.meanPixels is None):
+                return None
+            return self.predict(self.meanPixels, self.meanTexture, self.qualityFloor, 1.0) * self.keepRate()
+
+    def interval(self, remainingTime):
+        # returns the interval between the pictures that uses the budget by the end of the program at 'qualityFloor' and full resolution,
+        # with 'remainingTime' seconds left
+        cost = self.captureCost()
+        remaining = self.remaining()
+        if ((cost is None) or (remaining <= 0)):
+            return self.minimumInterval if (cost is None) else max(remainingTime, self.minimumInterval)
+        return max(cost * remainingTime / remaining, self.minimumInterval)
+
+    def describe(self, n, decision, score, texture, pixels, capturesLeft, size, interval, weight = 1):
+        # returns the line of the log of a decision, which can be read by replay()
+        # (with the counters and the inputs of decide() at full precision, so that the replay takes the same decisions)
+        quality, scale, predicted = decision
+        captures, kept = self.counts
+        return ("Rate control - n: " + str(n) + ", captures: " + str(captures) + ", kept: " + str(kept) + ", capturesLeft: " + str(float(capturesLeft))
+                + ", score: " + str(float(score)) + ", texture: " + str(float(texture)) + ", pixels: " + str(pixels) + ", weight: " + str(float(weight)) + ", quality: " + str(quality)
+                + ", scale: " + str(scale) + ", predicted: " + str(int(predicted)) + ", size: " + str(size) + ", interval: " + str(round(interval, 3)))
+
+def parseDecisions(lines):
+    # returns the decisions in the lines of the log, as dictionaries of their numeric values
+    decisions = []
+    for line in lines:
+        if ("Rate control - " in line):
+            fields = line.split("Rate control - ", 1)[1]
+            decisions.append({key: float(value) for key, value in re.findall(r"(\w+): ([-\d.e+]+)", fields)})
+    return decisions
+
+def replay(decisions, controller):
+    # replays the logged decisions with 'controller' (a new RateController, with the same or with different parameters)
+    # returns the decisions of the controller as (logged decision, new decision, size); when the new decision is different from the
+    # logged one, the size of the picture is estimated from the real size and the ratio between the two predictions
+    results = []
+    for logged in decisions:
+        controller.captures, controller.kept = int(logged["captures"]), int(logged["kept"])
+        score, texture, pixels = logged["score"], logged["texture"], int(logged["pixels"])
+        decision = controller.decide(score, texture, pixels, logged["capturesLeft"], logged.get("weight", 1))
+        if (decision is None):
+            results.append((logged, None, 0))
+            continue
+        quality, scale, predicted = decision
+        size = int(logged["size"])
+        if ((quality, scale) != (int(logged["quality"]), logged["scale"])):
+            size = int(size * rawSize(pixels, texture, quality, scale) / rawSize(pixels, texture, int(logged["quality"]), logged["scale"]))
+        controller.update(decision, score, texture, pixels, size)
+        results.append((logged, decision, size))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description = "Replay the decisions of the rate controller written in the log")
+    parser.add_argument("log", help = "log of the program (log.txt)")
+    parser.add_argument("--budget", type = float, default = 2975000000, help = "bytes of the pictures (default: 2975000000, like main.py)")
+    parser.add_argument("--floor", type = int, default = 75, help = "lowest quality at full resolution (default: 75)")
+    args = parser.parse_args()
+
+    with open(args.log, "r", encoding = "utf-8") as logfile:
+        decisions = parseDecisions(logfile)
+    results = replay(decisions, RateController(args.budget, qualityFloor = args.floor))
+
+    same = sum(1 for logged, decision, size in results if ((decision is not None) and ((decision[0], decision[1]) == (int(logged["quality"]), logged["scale"]))))
+    skipped = sum(1 for logged, decision, size in results if (decision is None))
+    print("Decisions: " + str(len(results)) + ", same as in the log: " + str(same) + ", pictures that would not be saved: " + str(skipped))
+    print("Bytes in the log: " + str(int(sum(logged["size"] for logged in decisions))) + ", bytes of the replay: " + str(sum(size for logged, decision, size in results)))
+    qualitiesUsed = np.array([decision[0] for logged, decision, size in results if (decision is not None)])
+    if (len(qualitiesUsed) > 0):
+        print("Mean quality of the replay: " + str(round(float(qualitiesUsed.mean()), 1)))
+
+if __name__ == "__main__":
+    main()
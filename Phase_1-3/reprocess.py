@@ -0,0 +1,165 @@
+from multiprocessing import Pool
+from pathlib import Path
+from time import perf_counter
+from PIL import Image
+import argparse
+import csv
+import os
+import cv2
+import jpeg
+from vision import segmentation, evaluate, classCounts, cropCircle, SegmentationWorkspace
+
+# offline reprocessing of the pictures taken on the ISS
+# segments, evaluates and crops every picture of a folder with a pool of processes, without any window or hardware,
+# and writes the score, the fraction of each class and the time of every picture to a single CSV table
+# the table is also the checkpoint: the pictures that are already in it are skipped, so an interrupted run can be started again
+# example: python reprocess.py /home/parsec/Data/images --crops /home/parsec/Data/cropped
+
+# parameters (the same as in main.py)
+scalingFactor = 0.25 # scaling factor of the pictures before the segmentation
+threshold = 2.5 # minimum score of a relevant picture
+extensions = [".jpg", ".jpeg", ".png"] # extensions of the pictures
+pictureQuality = 75 # JPEG quality of the cropped pictures
+
+# header of the table
+header = [
+    "File",
+    "Width[px]",
+    "Height[px]",
+    "Score",
+    "Relevant",
+    "Outside[%]",
+    "White[%]",
+    "Water[%]",
+    "Vegetation[%]",
+    "Land[%]",
+    "LoadTime[s]",
+    "SegmentationTime[s]",
+    "CropTime[s]",
+]
+
+# images used by the segmentation in each process
+workspace = None
+
+def processPicture(picPath, cropsFolder):
+    # segments, evaluates and crops the picture 'picPath', and returns its row of the table (None if the picture cannot be read)
+    # the cropped picture is saved in 'cropsFolder' if the picture is relevant and a folder is given
+    global workspace
+    if (workspace is None):
+        workspace = SegmentationWorkspace()
+
+    # load the picture and scale it down like in main.py
+    start = perf_counter()
+    image = cv2.imread(str(picPath))
+    if (image is None):
+        return None
+    scaledImage = cv2.resize(image, None, fx = scalingFactor, fy = scalingFactor)
+    loadTime = perf_counter() - start
+
+    # segment and evaluate it
+    start = perf_counter()
+    labels = segmentation(scaledImage, workspace = workspace)
+    counts = classCounts(labels)
+    score = evaluate(labels, counts)
+    segmentationTime = perf_counter() - start
+
+    # crop it to the window of the ISS
+    start = perf_counter()
+    cropped = cropCircle(scaledImage, image, scalingFactor)
+    cropTime = perf_counter() - start
+
+    # save the cropped picture with the EXIF data of the original one
+    if ((cropsFolder is not None) and (score >= threshold)):
+        cropPath = str(Path(cropsFolder) / picPath.name)
+        # (PIL only reads the header of the original picture, and the cropped one is compressed once with the EXIF data added to the file)
+        exifData = Image.open(picPath).info.get("exif")
+        with open(cropPath, "wb") as cropfile:
+            cropfile.write(jpeg.encode(cropped, exifData, pictureQuality))
+
+    # percentage of the picture covered by each class
+    fractions = [round(count / labels.size * 100, 3) for count in counts]
+    return [picPath.name, image.shape[1], image.shape[0], round(score, 3), int(score >= threshold)] + fractions + [round(loadTime, 4), round(segmentationTime, 4), round(cropTime, 4)]
+
+def processTask(task):
+    # processes a picture in the pool, returning its name with the row and the error (None if there was none)
+    # an error in a picture (a corrupt file, an error of OpenCV...) is returned, so that it does not stop the other pictures
+    picPath, cropsFolder = task
+    try:
+        row = processPicture(picPath, cropsFolder)
+    except Exception as e:
+        return picPath.name, None, type(e).__name__ + ": " + str(e).strip()
+    return picPath.name, row, (None if (row is not None) else "not an image")
+
+def loadCheckpoint(tablePath):
+    # returns the names of the pictures that are already in the table
+    # only the complete rows are kept: if the last row has been cut by an interruption, the table is rewritten without it
+    if (not tablePath.exists()):
+        return set()
+
+    with open(tablePath, "r", newline = "", encoding = "utf-8") as tablefile:
+        text = tablefile.read()
+    rows = [row for row in csv.reader(text.splitlines()) if (len(row) == len(header))]
+    complete = text.endswith("\n") and (len(rows) == len(text.splitlines()))
+    if (not complete):
+        # write the complete rows to a temporary file, then replace the table with it
+        tmpPath = tablePath.with_suffix(".tmp")
+        with open(tmpPath, "w", newline = "", encoding = "utf-8") as tmpfile:
+            csv.writer(tmpfile).writerows(rows)
+            tmpfile.flush()
+            os.fsync(tmpfile)
+        os.replace(tmpPath, tablePath)
+
+    return set(row[0] for row in rows if (row != header))
+
+def main():
+    parser = argparse.ArgumentParser(description = "Segment, evaluate and crop all the pictures of a folder")
+    parser.add_argument("folder", help = "folder of the pictures")
+    parser.add_argument("--table", help = "CSV table of the results (default: results.csv in the folder of the pictures)")
+    parser.add_argument("--crops", help = "folder where the cropped relevant pictures are saved (default: they are not saved)")
+    parser.add_argument("--processes", type = int, default = os.cpu_count(), help = "number of processes (default: number of cores)")
+    args = parser.parse_args()
+
+    picsFolder = Path(args.folder)
+    tablePath = Path(args.table) if (args.table is not None) else (picsFolder / "results.csv")
+    if (args.crops is not None):
+        # the cropped pictures have the same names as the original ones, so they cannot be saved in the same folder
+        if (Path(args.crops).resolve() == picsFolder.resolve()):
+            print("The cropped pictures cannot be saved in the folder of the pictures")
+            return
+        os.makedirs(args.crops, exist_ok = True)
+
+    # find the pictures that have not been processed yet
+    done = loadCheckpoint(tablePath)
+    pics = sorted(path for path in picsFolder.iterdir() if (path.is_file() and (path.suffix.lower() in extensions)))
+    todo = [path for path in pics if (path.name not in done)]
+    print("Pictures: " + str(len(pics)) + ", already processed: " + str(len(pics) - len(todo)))
+
+    # open the table or create it with its header
+    newTable = (not tablePath.exists()) or (tablePath.stat().st_size == 0)
+    tablefile = open(tablePath, "a", newline = "", encoding = "utf-8")
+    tablewriter = csv.writer(tablefile)
+    if (newTable):
+        tablewriter.writerow(header)
+
+    start = perf_counter()
+    processed = 0
+    unreadable = 0
+    with Pool(max(args.processes, 1)) as pool:
+        for name, row, error in pool.imap_unordered(processTask, [(path, args.crops) for path in todo]):
+            if (row is None):
+                # the picture is not written to the table, so it is tried again by the next run
+                unreadable += 1
+                print("Unable to read " + name + " (" + error + ")")
+                continue
+            # write the row and make sure it is saved, so that the picture is not processed again if the program is interrupted
+            tablewriter.writerow(row)
+            tablefile.flush()
+            os.fsync(tablefile)
+            processed += 1
+            print("[" + str(processed) + "/" + str(len(todo)) + "] " + name + " score: " + str(row[3]))
+
+    tablefile.close()
+    print("Processed " + str(processed) + " pictures in " + str(round(perf_counter() - start, 1)) + "s, unreadable: " + str(unreadable))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+from heapq import heappush, heappop
+from threading import Event
+from time import monotonic
+import math
+
+# scheduler of periodic tasks with a hard deadline, like the loop of AllFiles/timer.py but without checking the time continuously:
+# the tasks are kept in a priority queue ordered by the time when they are due, and the scheduler sleeps until the first one is due
+# the time is measured with a monotonic clock, so it is not affected by changes of the system clock
+# the tasks run one at a time in the thread that calls run(), so a slow task delays the others: for every task, the scheduler
+# measures how late it started (the difference between the time when it was due and the time when it actually started)
+# an exception in a task does not stop the scheduler: it is passed to 'onError', and the task runs again at its next time
+
+class Task:
+    # task that runs 'work()' every 'period' seconds
+    # 'period' can also be a function that returns the number of seconds, read after each run (for example an interval that changes)
+
+    def __init__(self, name, work, period):
+        self.name = name
+        self.work = work
+        self.period = period
+        self.lastPeriod = period if (not callable(period)) else 1 # last period, used if the function of the period fails
+        self.errors = 0 # runs that have raised an exception
+        # delays of the starts, in seconds
+        self.runs = 0
+        self.lateMean = 0
+        self.lateSquares = 0 # sum of the squared differences from the mean (Welford's algorithm), for the jitter
+        self.lateMax = 0
+
+    def nextPeriod(self):
+        # seconds until the next run
+        self.lastPeriod = self.period() if callable(self.period) else self.period
+        return self.lastPeriod
+
+    def record(self, late):
+        # add the delay of a start to the statistics
+        self.runs += 1
+        delta = late - self.lateMean
+        self.lateMean += delta / self.runs
+        self.lateSquares += delta * (late - self.lateMean)
+        self.lateMax = max(self.lateMax, late)
+
+    def jitter(self):
+        # standard deviation of the delays of the starts
+        return math.sqrt(self.lateSquares / self.runs) if (self.runs > 0) else 0
+
+    def report(self):
+        # statistics of the task, for the log
+        return (self.name + ": " + str(self.runs) + " runs, late start " + str(round(self.lateMean * 1000, 1)) + "ms mean, "
+                + str(round(self.lateMax * 1000, 1)) + "ms max, jitter " + str(round(self.jitter() * 1000, 1)) + "ms"
+                + ((", " + str(self.errors) + " errors") if (self.errors > 0) else ""))
+
+class Scheduler:
+    # runs the periodic tasks until 'duration' seconds have passed from its creation, or until stop() is called
+    # 'clock' returns the current time in seconds and 'wait(seconds)' sleeps: by default they are the monotonic clock and a sleep
+    # that is interrupted by stop()
+    # 'onError(name, exception)' is called when a task raises an exception (by default the exception is printed)
+
+    def __init__(self, duration, clock = monotonic, wait = None, onError = None):
+        self.clock = clock
+        self.onError = onError
+        self.stopEvent = Event()
+        self.wait = wait if (wait is not None) else self.stopEvent.wait
+        self.start = clock()
+        self.deadline = self.start + duration # hard deadline of the mission
+        self.queue = [] # (time when the task is due, order in which the tasks were added, task)
+        self.tasks = []
+
+    def every(self, name, work, period, delay = 0):
+        # adds a task that runs for the first time after 'delay' seconds, then every 'period' seconds
+        task = Task(name, work, period)
+        heappush(self.queue, (self.clock() + delay, len(self.tasks), task))
+        self.tasks.append(task)
+        return task
+
+    def stop(self):
+        # stops the scheduler after the task that is running (it can be called from other threads)
+        self.stopEvent.set()
+
+    def remaining(self):
+        # seconds until the deadline
+        return max(self.deadline - self.clock(), 0)
+
+    def run(self):
+        # runs the tasks when they are due, and sleeps in between
+        # returns True if the deadline has been reached, False if the scheduler has been stopped
+        while (not self.stopEvent.is_set()):
+            now = self.clock()
+            if (now >= self.deadline):
+                return True
+
+            if (len(self.queue) == 0):
+                # no tasks: sleep until the deadline
+                self.wait(self.deadline - now)
+                continue
+
+            due, order, task = self.queue[0]
+            if (now < due):
+                # sleep until the first task is due (or until the deadline, if it comes first)
+                self.wait(min(due, self.deadline) - now)
+                continue
+
+            heappop(self.queue)
+            task.record(now - due)
+            try:
+                task.work()
+            except Exception as e:
+                task.errors += 1
+                self.error(task, e)
+
+            # the next run is due one period after this one was due, so that the delays do not add up;
+            # if the task has taken longer than its period, the runs that have been missed are skipped instead of run one after the other
+            # (if the period cannot be computed, the last one is used)
+            try:
+                period = task.nextPeriod()
+            except Exception as e:
+                self.error(task, e)
+                period = task.lastPeriod
+            nextDue = max(due + period, self.clock())
+            heappush(self.queue, (nextDue, order, task))
+        return False
+
+    def error(self, task, e):
+        # passes the exception of a task to 'onError'
+        if (self.onError is not None):
+            self.onError(task.name, e)
+        else:
+            print("Error in the task " + task.name + ": " + str(e))
+
+    def report(self):
+        # statistics of all the tasks, one line each
+        return [task.report() for task in self.tasks]
+
+def main():
+    # example: three tasks at different rates for 10 seconds, like AllFiles/timer.py
+    scheduler = Scheduler(10)
+    scheduler.every("task 1", lambda: print("task that runs every 2 sec"), 2)
+    scheduler.every("task 2", lambda: print("task that runs every 5 sec"), 5)
+    scheduler.every("task 3", lambda: print("task that runs every 1 sec"), 1)
+    scheduler.run()
+    print("10 sec elapsed")
+    for line in scheduler.report():
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+from threading import Thread, Event, Lock
+from time import monotonic
+from clock import Clock
+import numpy as np
+
+# sampling of the SenseHat in a background thread
+# the sensors are read 'rate' times per second into a ring buffer of the last 'size' samples (a NumPy array with one row per sample),
+# so the other threads never wait for the I2C reads: the telemetry takes the mean, minimum and maximum of every value over the samples
+# since its last row, and every picture is tagged with the sample nearest to the time when it was taken
+
+# values read from the SenseHat, in the order of data.csv
+channels = ["yaw", "pitch", "roll", "xAcceleration", "yAcceleration", "zAcceleration", "xMag", "yMag", "zMag", "xω", "yω", "zω", "temperature", "pressure", "humidity"]
+# the first three values are angles in degrees (from 0 to 360), so their mean is calculated on the circle
+angles = 3
+
+def readSense(sense, errors):
+    # reads every sensor of the SenseHat once and returns the values, NaN for the sensors that cannot be read
+    # the errors are saved in the dictionary 'errors' by the name of the sensor (the same names that main.py used in the log)
+    values = np.full(len(channels), np.nan)
+
+    def read(name, position, function, keys = None):
+        try:
+            result = function()
+            if (keys is None):
+                values[position] = result
+            else:
+                values[position:position + len(keys)] = [result[key] for key in keys]
+        except Exception as e:
+            errors[name] = str(e)
+
+    read("Compass", 0, sense.get_orientation, ["yaw", "pitch", "roll"]) # orientation [Deg]
+    read("Accelerometer", 3, sense.get_accelerometer_raw, ["x", "y", "z"]) # acceleration [g]
+    read("Compass", 6, sense.get_compass_raw, ["x", "y", "z"]) # magnetic field intensity [µT]
+    read("Gyro", 9, sense.get_gyroscope_raw, ["x", "y", "z"]) # angular velocity [rad/s]
+    read("Thermometer", 12, sense.get_temperature) # temperature [°C]
+    read("Barometer", 13, sense.get_pressure) # pressure [mbar = hPa]
+    read("Humidity", 14, sense.get_humidity) # humidity [%]
+    return values
+
+def aggregate(samples):
+    # returns the mean, the minimum and the maximum of every value of 'samples' (one row per sample), ignoring the NaN values
+    # (NaN if a value has never been read)
+    valid = ~np.isnan(samples)
+    counts = valid.sum(axis = 0)
+    missing = (counts == 0)
+
+    mean = np.where(valid, samples, 0).sum(axis = 0) / np.maximum(counts, 1)
+    # mean of the angles on the circle, so that the mean of 359° and 1° is 0° and not 180°
+    radians = np.radians(samples[:, :angles])
+    sines = np.where(valid[:, :angles], np.sin(radians), 0).sum(axis = 0)
+    cosines = np.where(valid[:, :angles], np.cos(radians), 0).sum(axis = 0)
+    circular = np.degrees(np.arctan2(sines, cosines)) % 360
+    # (a tiny negative angle becomes 360 after the modulo)
+    mean[:angles] = np.where(circular >= 360, 0, circular)
+
+    minimum = np.where(valid, samples, np.inf).min(axis = 0, initial = np.inf)
+    maximum = np.where(valid, samples, -np.inf).max(axis = 0, initial = -np.inf)
+    for values in (mean, minimum, maximum):
+        values[missing] = np.nan
+    return mean, minimum, maximum
+
+class SenseSampler(Thread):
+    # thread that reads the SenseHat 'rate' times per second and keeps the last 'size' samples
+    # stop() must be called at the end
+    # if 'timings' (a timing.Timings) is given, every reading of the sensors (I2C) is measured as the stage "sense"
+    # the times of the samples are those of 'clock' (the real clock by default, see clock.py)
+
+    def __init__(self, sense, rate = 10, size = 1024, timings = None, clock = None):
+        # the thread does not keep the program running if it cannot be stopped
+        Thread.__init__(self, name = "sensors", daemon = True)
+        self.sense = sense
+        self.rate = rate
+        self.size = size
+        self.timings = timings
+        self.clock = Clock() if (clock is None) else clock
+        self.values = np.full((size, len(channels)), np.nan) # ring buffer of the samples
+        self.times = np.full(size, np.nan) # monotonic time of each sample
+        self.count = 0 # number of samples taken since the start (the next one is written in the row count % size)
+        self.errors = {} # last error of each sensor, since the errors were last taken
+        self.lock = Lock()
+        self.stopEvent = Event()
+
+    def run(self):
+        period = 1 / self.rate
+        due = self.clock.monotonic()
+        while (not self.stopEvent.is_set()):
+            errors = {}
+            time = self.clock.monotonic()
+            start = monotonic()
+            values = readSense(self.sense, errors)
+            if (self.timings is not None):
+                self.timings.add("sense", monotonic() - start)
+
+            with self.lock:
+                row = self.count % self.size
+                self.values[row] = values
+                self.times[row] = time
+                self.count += 1
+                self.errors.update(errors)
+
+            # wait for the next sample, skipping the ones that have been missed if reading the sensors took too long
+            due = max(due + period, self.clock.monotonic())
+            self.clock.wait(due - self.clock.monotonic(), self.stopEvent)
+
+    def stop(self):
+        # stops the thread after the sample that is being taken
+        self.stopEvent.set()
+
+    def nearest(self, time):
+        # returns the time and the values of the sample nearest to 'time' (monotonic), or None if there are no samples
+        with self.lock:
+            if (self.count == 0):
+                return None
+            row = int(np.nanargmin(np.abs(self.times - time)))
+            return self.times[row], self.values[row].copy()
+
+    def window(self, first):
+        # returns the samples taken from the sample number 'first' (only the last 'size' samples are kept), one row per sample,
+        # and the number of the next sample
+        with self.lock:
+            first = max(first, self.count - self.size)
+            rows = np.arange(first, self.count) % self.size
+            return self.values[rows], self.count
+
+    def takeErrors(self):
+        # returns the errors of the sensors since the last call
+        with self.lock:
+            errors = self.errors
+            self.errors = {}
+        return errors
+
+def main():
+    # example: samples the SenseHat for 5 seconds and prints the mean, minimum and maximum of every value
+    from sense_hat import SenseHat
+    sampler = SenseSampler(SenseHat())
+    sampler.start()
+    sampler.stopEvent.wait(5)
+    sampler.stop()
+    sampler.join()
+    samples, count = sampler.window(0)
+    mean, minimum, maximum = aggregate(samples)
+    print(str(count) + " samples")
+    for name, values in zip(channels, zip(mean, minimum, maximum)):
+        print(name + ": " + ", ".join(str(round(value, 3)) for value in values))
+    print(sampler.takeErrors())
+
+if __name__ == "__main__":
+    main()
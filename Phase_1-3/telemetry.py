@@ -0,0 +1,196 @@
+from datetime import datetime
+from groupcommit import GroupCommitFile
+import argparse
+import struct
+import csv
+import os
+import numpy as np
+from sensors import channels, aggregate
+
+# binary files of the telemetry, with one record of fixed size for every row of their CSV file:
+# - data.bin has a record for every picture saved, at the time when it was taken, with the values of the SenseHat nearest to it
+#   (exported to data.csv, with the same header and the same text as main.py used to write, one row per picture)
+# - sense.bin has a record every few seconds, with the mean, the minimum and the maximum of the samples of the SenseHat since the previous one
+#   (exported to sense.csv, with the columns of data.csv followed by the number of samples, the minimums and the maximums)
+# the files start with a header of 'headerSize' bytes, followed by the records of the type 'record' one after the other:
+# the records are only appended, and they can be read without parsing any text with np.memmap (load(path))
+# a value that could not be read is NaN, and the bits of the 'valid' field say which parts of the record are valid
+
+# header of the file: magic bytes, version, size of the records
+magic = b"PARSECTM"
+version = 1
+headerSize = 64
+
+# bits of the 'valid' field
+validTime = 1 # date and time
+validPosition = 2 # position of the ISS
+def validChannel(i):
+    # bit of the value number 'i' of the SenseHat (read in at least one sample)
+    return 4 << i
+
+# type of the records
+record = np.dtype([
+    ("monotonic", "<f8"), # monotonic time of the row [s]
+    ("time", "<f8"), # time of the row, in seconds since 01/01/1970
+    ("altitude", "<f8"), # position of the ISS: altitude [m], latitude and longitude [Deg]
+    ("latitude", "<f8"),
+    ("longitude", "<f8"),
+    ("samples", "<u4"), # number of samples of the SenseHat in the row
+    ("valid", "<u4"), # bits of the valid parts of the record
+    ("mean", "<f8", (len(channels),)), # mean, minimum and maximum of the values of the SenseHat (in the order of 'channels')
+    ("minimum", "<f8", (len(channels),)),
+    ("maximum", "<f8", (len(channels),)),
+])
+
+# header of data.csv
+header = [
+    "Date[DD/MM/YYYY]",
+    "Time[UTC-24H h:m:s]",
+    "Altitude[m]",
+    "Latitude[Deg]",
+    "Longitude[Deg]",
+    "Yaw[Deg]",
+    "Pitch[Deg]",
+    "Roll[Deg]",
+    "xAcceleration[g]",
+    "yAcceleration[g]",
+    "zAcceleration[g]",
+    "xMag[µT]",
+    "yMag[µT]",
+    "zMag[µT]",
+    "xω[rad/s]",
+    "yω[rad/s]",
+    "zω[rad/s]",
+    "Temperature[°C]",
+    "Pressure[hPa]",
+    "Humidity[%]",
+]
+senseHeader = header[5:]
+# header of sense.csv: the values of the SenseHat are the means of the samples since the previous row, and the number of samples,
+# the minimum and the maximum of each value are in the last columns
+statsHeader = header + ["Samples"] + [name.replace("[", "Min[") for name in senseHeader] + [name.replace("[", "Max[") for name in senseHeader]
+
+def fileHeader():
+    # returns the header of the file
+    return struct.pack("<8sII", magic, version, record.itemsize).ljust(headerSize, b"\x00")
+
+def checkHeader(data):
+    # raises ValueError if 'data' is not the header of a telemetry file with the records of this version
+    fileMagic, fileVersion, itemsize = struct.unpack("<8sII", data[:16])
+    if ((fileMagic != magic) or (fileVersion != version) or (itemsize != record.itemsize)):
+        raise ValueError("Not a telemetry file of version " + str(version))
+
+def newRecord():
+    # returns an empty record, with all the values NaN and no valid parts
+    row = np.zeros(1, dtype = record)
+    for field in ["monotonic", "time", "altitude", "latitude", "longitude", "mean", "minimum", "maximum"]:
+        row[field] = np.nan
+    return row
+
+def setSense(row, samples):
+    # sets the values of the SenseHat of the record 'row' from the samples (one row per sample)
+    mean, minimum, maximum = aggregate(samples)
+    row["mean"], row["minimum"], row["maximum"] = mean, minimum, maximum
+    row["samples"] = len(samples)
+    for i in range(len(channels)):
+        if (not np.isnan(mean[i])):
+            row["valid"] |= validChannel(i)
+
+class TelemetryStore:
+    # telemetry file opened for appending, whose records are saved to the disk in groups like the lines of the log
+    # if the program was killed while a record was being written, the incomplete record is removed when the file is opened
+
+    def __init__(self, path, interval = 5, records = 50):
+        self.path = path
+        self.recovered = 0 # bytes of the incomplete last record that has been removed
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if (size < headerSize):
+            # new file (or a file whose header was not written completely): write the header
+            with open(path, "wb") as file:
+                file.write(fileHeader())
+                file.flush()
+                os.fsync(file)
+            size = headerSize
+        else:
+            with open(path, "rb+") as file:
+                checkHeader(file.read(headerSize))
+                complete = headerSize + (size - headerSize) // record.itemsize * record.itemsize
+                if (complete < size):
+                    file.truncate(complete)
+                    file.flush()
+                    os.fsync(file)
+                    self.recovered = size - complete
+                    size = complete
+        self.count = (size - headerSize) // record.itemsize # number of records in the file
+        self.file = GroupCommitFile(path, interval, records, binary = True)
+
+    def append(self, row):
+        # adds a record (returned by newRecord()) to the file
+        self.file.write(row.tobytes())
+        self.count += 1
+
+    def commit(self):
+        # saves the records that are waiting to the disk
+        self.file.commit()
+
+    def close(self):
+        self.file.close()
+
+def load(path):
+    # returns the records of the telemetry file 'path' as a read-only array mapped to the file (without the incomplete last record)
+    with open(path, "rb") as file:
+        checkHeader(file.read(headerSize))
+    count = (os.path.getsize(path) - headerSize) // record.itemsize
+    if (count == 0):
+        return np.zeros(0, dtype = record)
+    return np.memmap(path, dtype = record, mode = "r", offset = headerSize, shape = (count,))
+
+def formatTime(val):
+    # adds a 0 before the number in case it is <10
+    return (str(val) if (val >= 10) else ("0" + str(val)))
+
+def formatValue(value):
+    # returns a value of the SenseHat for data.csv, "-" if it could not be read
+    return "-" if np.isnan(value) else str(float(value))
+
+def csvRow(row, stats = False):
+    # returns the row of data.csv of the record 'row', with "-" for the parts that are not valid
+    # (with 'stats', the row of sense.csv: also the number of samples, the minimums and the maximums)
+    values = []
+    if (row["valid"] & validTime):
+        time = datetime.fromtimestamp(row["time"])
+        values += [formatTime(time.day) + "/" + formatTime(time.month) + "/" + formatTime(time.year), formatTime(time.hour) + ":" + formatTime(time.minute) + ":" + formatTime(time.second)]
+    else:
+        values += ["-", "-"]
+    if (row["valid"] & validPosition):
+        values += [str(int(row["altitude"])), str(float(row["latitude"])), str(float(row["longitude"]))]
+    else:
+        values += ["-", "-", "-"]
+    values += [formatValue(value) for value in row["mean"]]
+    if stats:
+        values.append(str(int(row["samples"])))
+        values += [formatValue(value) for value in row["minimum"]]
+        values += [formatValue(value) for value in row["maximum"]]
+    return values
+
+def exportCsv(rows, csvPath, stats = False):
+    # writes the records 'rows' to the CSV file 'csvPath', with 'header' (or 'statsHeader' with 'stats')
+    with open(csvPath, "w", encoding = "utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(statsHeader if stats else header)
+        for row in rows:
+            writer.writerow(csvRow(row, stats))
+
+def main():
+    parser = argparse.ArgumentParser(description = "Export the telemetry file to CSV")
+    parser.add_argument("telemetry", help = "telemetry file (data.bin or sense.bin)")
+    parser.add_argument("csv", help = "CSV file to write (data.csv or sense.csv)")
+    parser.add_argument("--stats", action = "store_true", help = "also write the number of samples, the minimums and the maximums (sense.csv)")
+    args = parser.parse_args()
+
+    rows = load(args.telemetry)
+    exportCsv(rows, args.csv, args.stats)
+    print("Exported " + str(len(rows)) + " rows to " + args.csv)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+import numpy as np
+import enhance
+import indices
+import cv2
+
+# computer vision functions used by main.py
+# they are kept in a separate file, which does not need the Astro Pi hardware, so that they can also be used on any computer
+
+# segmentation classes (values of the label map)
+outsideClass = 0 # outside of the window
+whiteClass = 1 # glaciers + clouds
+waterClass = 2 # water
+vegetationClass = 3 # vegetation
+landClass = 4 # anything else, mostly land without vegetation
+
+# BGR colour of each class, only used to display the label map
+palette = np.array([
+    [0, 0, 0], # outside: black
+    [255, 255, 255], # glaciers + clouds: white
+    [255, 0, 0], # water: blue
+    [0, 255, 0], # vegetation: green
+    [0, 0, 255], # other: red
+], dtype = np.uint8)
+
+# the class of each pixel is decided by 4 bits: inside the window (1), white (2), NDWI (4) and NDVI (8)
+# this table converts the combination of the bits into the class, with white > vegetation > water > land
+classLut = np.zeros(256, dtype = np.uint8)
+for bits in range(16):
+    if not (bits & 1):
+        classLut[bits] = outsideClass
+    elif (bits & 2):
+        classLut[bits] = whiteClass
+    elif (bits & 8):
+        classLut[bits] = vegetationClass
+    elif (bits & 4):
+        classLut[bits] = waterClass
+    else:
+        classLut[bits] = landClass
+
+class SegmentationWorkspace:
+    # preallocated images used by segmentation(), so that segmenting a picture does not allocate any new image
+    # the images are allocated the first time the workspace is used, and again only if the size of the pictures changes
+    # the label map returned by segmentation() belongs to the workspace: it is overwritten by the next picture
+
+    def __init__(self):
+        self.height, self.width = 0, 0
+
+    def prepare(self, height, width):
+        # make sure that the images have the size of the picture
+        if ((height, width) == (self.height, self.width)):
+            return
+        self.height, self.width = height, width
+
+        self.image = np.empty((height, width, 3), dtype = np.uint8) # free image of the size of the picture (e.g. thumbnails)
+        self.masked = np.empty((height, width, 3), dtype = np.uint8) # picture without the parts outside of the window
+        self.enhanced = np.empty((height, width, 3), dtype = np.uint8) # picture with increased contrast
+        self.b = np.empty((height, width), dtype = np.uint8) # blue channel (infrared)
+        self.g = np.empty((height, width), dtype = np.uint8) # green channel
+        self.r = np.empty((height, width), dtype = np.uint8) # red channel
+        self.index = np.empty((height, width), dtype = np.float32) # value of the indexes
+        self.pairs = np.empty((height, width), dtype = np.intp) # position of the pairs of pixels in the table of the indexes (intp, the type used by np.take)
+        self.ndvi = np.empty((height, width), dtype = np.uint8) # NDVI mask
+        self.ndwi = np.empty((height, width), dtype = np.uint8) # NDWI mask
+        self.grey = np.empty((height, width), dtype = np.uint8) # greyscale picture
+        self.white = np.empty((height, width), dtype = np.uint8) # mask of the white areas
+        self.bits = np.empty((height, width), dtype = np.uint8) # bits of the classes
+        self.labels = np.empty((height, width), dtype = np.uint8) # label map
+        self.greyValues = np.empty((height, width), dtype = np.uint32) # exact greyscale values, for the mean
+        self.greyScratch = np.empty((height, width), dtype = np.uint32)
+        self.floodMask = np.empty((height + 2, width + 2), dtype = np.uint8) # mask of the flood fill
+
+def segmentation(im, window = None, workspace = None, smooth = True):
+    # Image Segmentation
+    # outputs the label map of 'im': a single channel image where every pixel contains its class
+    #   0: outside of the window
+    #   1: glaciers + clouds
+    #   2: water
+    #   3: vegetation
+    #   4: other
+    # the masked frame is only read once per index in float32, and the masks are packed into bits and converted into the classes
+    # with a single lookup table, so that no float64 copies, colourised images or overlays are needed
+    # every image is written into the preallocated images of 'workspace' (a SegmentationWorkspace), if it is given
+    # with smooth = False the indexes are not blurred and the holes of the masks are not filled (faster, but the label map is noisier)
+
+    # prepare the images
+    if (workspace is None):
+        workspace = SegmentationWorkspace()
+    ws = workspace
+    ws.prepare(im.shape[0], im.shape[1])
+
+    # get mask of the round window, from the tracker if there is one
+    mk = window.getMask(im) if (window is not None) else mask(im) # single channel
+
+    # remove the parts of the image that are outside of the mask (without making a 3 channel copy of the mask)
+    # the pixels outside of the mask are not written, so the image is cleared first
+    ws.masked.fill(0)
+    im = cv2.bitwise_and(im, im, dst = ws.masked, mask = mk)
+
+    # separate channels blue, green, red from image and store them into different arrays
+    b = cv2.extractChannel(im, 0, dst = ws.b)
+    g = cv2.extractChannel(im, 1, dst = ws.g)
+    r = cv2.extractChannel(im, 2, dst = ws.r)
+
+    # NDVI
+    # find the areas covered by vegetation (NDVI > 0.25)
+    # the blue channel contains the infrared value
+    ndvi = indexThreshold(b, r, 0.25, ws.index, ws.pairs, ws.ndvi, smooth)
+    if (smooth):
+        fill(ndvi, ndvi, ws.floodMask)
+
+    # NDWI
+    # find the oceans and lakes (NDWI > 0.01)
+    ndwi = indexThreshold(g, b, 0.01, ws.index, ws.pairs, ws.ndwi, smooth)
+    if (smooth):
+        fill(ndwi, ndwi, ws.floodMask)
+
+    # WHITE
+    # extract the white areas from the original image, which will be used to find glaciers and clouds:
+    # increase the contrast of the image twice (+15% and +75%), convert it to grayscale and select only the brightest pixels
+    # the second contrast change depends on the mean of the image after the first one, then they are combined into a single lookup table
+    pixels = im.shape[0] * im.shape[1]
+    firstLut = enhance.contrastLut(enhance.roundMean(enhance.greySum(im, grey = ws.greyValues, scratch = ws.greyScratch), pixels), 1 + 15 / 100)
+    enhanced = cv2.LUT(im, firstLut, dst = ws.enhanced)
+    whiteLut = enhance.contrastLut(enhance.roundMean(enhance.greySum(enhanced, grey = ws.greyValues, scratch = ws.greyScratch), pixels), 1 + 75 / 100)[firstLut]
+    enhanced = cv2.LUT(im, whiteLut, dst = ws.enhanced)
+    grey = cv2.cvtColor(enhanced, cv2.COLOR_BGR2GRAY, dst = ws.grey)
+    white = cv2.compare(grey, 232, cv2.CMP_GT, dst = ws.white)
+
+    # LABEL MAP
+    # pack the masks into the bits of a single image (they are all 0 or 255, so each one keeps only its own bit)
+    bits = cv2.bitwise_and(mk, 1, dst = ws.bits)
+    cv2.bitwise_or(bits, cv2.bitwise_and(white, 2, dst = white), dst = bits)
+    cv2.bitwise_or(bits, cv2.bitwise_and(ndwi, 4, dst = ndwi), dst = bits)
+    cv2.bitwise_or(bits, cv2.bitwise_and(ndvi, 8, dst = ndvi), dst = bits)
+
+    # convert the bits into the classes
+    return cv2.LUT(bits, classLut, dst = ws.labels)
+
+def indexMask(a, b, threshold):
+    # returns the filled mask of the pixels where the normalised index (a - b) / (a + b) is above the threshold
+    return fill(indexThreshold(a, b, threshold))
+
+def indexThreshold(a, b, threshold, index = None, pairs = None, dst = None, blur = True):
+    # returns the mask of the pixels where the normalised index (a - b) / (a + b) is above the threshold, without filling it
+    # 'a' and 'b' are single channel 8-bit images, the float32 index is read from the table in indices.py
+    # 'index' (float32), 'pairs' (uint16 or intp) and 'dst' (8-bit) can be preallocated images, to avoid allocating new ones
+
+    # read the index of every pixel from the table, without dividing
+    index = indices.normalisedDifference(a, b, dst = index, pairs = pairs)
+
+    # blur the image to remove any small artifacts
+    if (blur):
+        cv2.GaussianBlur(index, (5, 5), 0, dst = index)
+    # select the pixels above the threshold, the result is already an 8-bit 0/255 mask
+    return cv2.compare(index, threshold, cv2.CMP_GT, dst = dst)
+
+def segmentationTiled(im, window = None, stripHeight = 256):
+    # Image Segmentation in horizontal strips
+    # gives exactly the same label map as segmentation(im, window), but the float32 images and the other temporary images
+    # only cover a strip of 'stripHeight' rows at a time, so that full or half resolution pictures can be segmented
+    # the only images as big as the whole picture are the mask of the window, the bits of the classes and the label map
+    height, width = im.shape[:2]
+
+    # get mask of the round window, from the tracker if there is one
+    mk = window.getMask(im) if (window is not None) else mask(im)
+
+    # WHITE
+    # the two contrast changes depend on the mean grey value of the whole masked image, and of the image after the first change
+    # they are calculated by adding up the strips, and then the two changes are combined into a single lookup table
+    strips = [(top, min(top + stripHeight, height)) for top in range(0, height, stripHeight)]
+    pixels = height * width
+    total = sum(stripGreySum(im, mk, top, bottom) for top, bottom in strips)
+    firstLut = enhance.contrastLut(enhance.roundMean(total, pixels), 1 + 15 / 100)
+    total = sum(stripGreySum(im, mk, top, bottom, firstLut) for top, bottom in strips)
+    whiteLut = enhance.contrastLut(enhance.roundMean(total, pixels), 1 + 75 / 100)[firstLut]
+
+    # pack the masks of every strip into the bits of a single image
+    bits = np.empty((height, width), dtype = np.uint8)
+    for top, bottom in strips:
+        stripBits(im, mk, bits, top, bottom, whiteLut)
+
+    # fill the holes of the NDWI and NDVI masks on the whole image, since they can be connected across the strips
+    fillBit(bits, 4)
+    fillBit(bits, 8)
+
+    # convert the bits into the classes
+    return cv2.LUT(bits, classLut)
+
+def fillBit(bits, bit, plane = None, floodMask = None):
+    # fills the holes of the mask stored in the bit 'bit' of the image 'bits', like fill() does, directly in 'bits'
+    # only two temporary images are needed: the mask of the bit and the mask of the flood fill, which can be preallocated
+    # ('plane' of the size of 'bits', 'floodMask' two pixels bigger)
+
+    # get the mask of the bit as a 0/255 image
+    plane = cv2.bitwise_and(bits, bit, dst = plane)
+    cv2.compare(plane, 0, cv2.CMP_GT, dst = plane)
+
+    # fill the mask from the top-left and bottom-right corners, as in fill()
+    if (floodMask is None):
+        floodMask = np.empty((plane.shape[0] + 2, plane.shape[1] + 2), dtype = np.uint8)
+    floodMask.fill(0)
+    cv2.floodFill(plane, floodMask, (0, 0), 255, 0, 0)
+    cv2.floodFill(plane, floodMask, (plane.shape[1] - 1, plane.shape[0] - 1), 255, 0, 0)
+
+    # the pixels that are still black are the holes: set the bit there too
+    cv2.compare(plane, 0, cv2.CMP_EQ, dst = plane)
+    cv2.bitwise_and(plane, bit, dst = plane)
+    cv2.bitwise_or(bits, plane, dst = bits)
+
+def maskedStrip(im, mk, top, bottom, dst = None):
+    # returns the rows from 'top' to 'bottom' of the image, with the parts outside of the window removed
+    # ('dst' can be a preallocated image of the size of the strip)
+    if (dst is not None):
+        # the pixels outside of the mask are not written
+        dst.fill(0)
+    return cv2.bitwise_and(im[top:bottom], im[top:bottom], dst = dst, mask = mk[top:bottom])
+
+def stripWorkspace(workspaces, height, width):
+    # returns the SegmentationWorkspace of the strips of 'height' rows and 'width' columns in the dictionary 'workspaces',
+    # making it the first time (the strips of a picture have only a few different sizes: with and without the halo)
+    if ((height, width) not in workspaces):
+        workspaces[(height, width)] = SegmentationWorkspace()
+        workspaces[(height, width)].prepare(height, width)
+    return workspaces[(height, width)]
+
+def stripGreySum(im, mk, top, bottom, lut = None, workspaces = None):
+    # returns the sum of the grey values of the rows from 'top' to 'bottom' of the masked image, after the lookup table 'lut' if there is one
+    # the images of the strip are kept in 'workspaces' if it is given (see stripWorkspace())
+    if (workspaces is None):
+        strip = maskedStrip(im, mk, top, bottom)
+        if (lut is not None):
+            cv2.LUT(strip, lut, dst = strip)
+        return enhance.greySum(strip)
+    ws = stripWorkspace(workspaces, bottom - top, im.shape[1])
+    strip = maskedStrip(im, mk, top, bottom, ws.masked)
+    if (lut is not None):
+        cv2.LUT(strip, lut, dst = strip)
+    return enhance.greySum(strip, grey = ws.greyValues, scratch = ws.greyScratch)
+
+def stripBits(im, mk, bits, top, bottom, whiteLut, workspaces = None):
+    # writes the bits of the window, of the white areas, of the NDWI and of the NDVI of the rows from 'top' to 'bottom' into 'bits'
+    # the holes of the NDWI and NDVI masks are not filled, since they can be connected to the other strips
+    # 'whiteLut' is the lookup table of the two contrast changes of the whole image
+    # the images of the strip are kept in 'workspaces' if it is given (see stripWorkspace()), otherwise they are allocated
+    height = im.shape[0]
+
+    # rows above and below the strip that are needed by the 5x5 Gaussian blur
+    halo = 2
+
+    # take the strip with the rows of the halo (where there are any)
+    start = max(top - halo, 0)
+    end = min(bottom + halo, height)
+    if (workspaces is None):
+        ws = None
+        strip = maskedStrip(im, mk, start, end)
+        b, g, r = cv2.split(strip)
+    else:
+        ws = stripWorkspace(workspaces, end - start, im.shape[1])
+        strip = maskedStrip(im, mk, start, end, ws.masked)
+        b = cv2.extractChannel(strip, 0, dst = ws.b)
+        g = cv2.extractChannel(strip, 1, dst = ws.g)
+        r = cv2.extractChannel(strip, 2, dst = ws.r)
+    # rows of the strip without the halo
+    rows = slice(top - start, top - start + (bottom - top))
+    # bits of the rows of the strip, starting from the window
+    rowBits = cv2.bitwise_and(mk[top:bottom], 1, dst = bits[top:bottom])
+
+    # NDVI and NDWI
+    if (ws is None):
+        ndvi = indexThreshold(b, r, 0.25)[rows]
+        ndwi = indexThreshold(g, b, 0.01)[rows]
+        enhanced, grey, white = None, None, None
+    else:
+        ndvi = indexThreshold(b, r, 0.25, ws.index, ws.pairs, ws.ndvi)[rows]
+        ndwi = indexThreshold(g, b, 0.01, ws.index, ws.pairs, ws.ndwi)[rows]
+        enhanced, grey, white = ws.enhanced[rows], ws.grey[rows], ws.white[rows]
+    # white areas
+    white = cv2.compare(cv2.cvtColor(cv2.LUT(strip[rows], whiteLut, dst = enhanced), cv2.COLOR_BGR2GRAY, dst = grey), 232, cv2.CMP_GT, dst = white)
+
+    cv2.bitwise_or(rowBits, cv2.bitwise_and(white, 2, dst = white), dst = rowBits)
+    cv2.bitwise_or(rowBits, cv2.bitwise_and(ndwi, 4, dst = ndwi), dst = rowBits)
+    cv2.bitwise_or(rowBits, cv2.bitwise_and(ndvi, 8, dst = ndvi), dst = rowBits)
+
+def classCounts(labels):
+    # returns the number of pixels of each class of the label map
+    # the histogram is computed directly on the 8-bit labels (np.bincount would make a 64-bit copy of the whole label map)
+    # the bins are one class wide, and the counts are exact since a picture has less than 2^24 pixels
+    hist = cv2.calcHist([labels], [0], None, [len(palette)], [0, len(palette)])
+    return hist.ravel().astype(np.int64)
+
+def evaluate(labels, counts = None):
+    # count the number of pixels of each class of the label map, unless they have already been counted
+    if (counts is None):
+        counts = classCounts(labels)
+
+    # get the total number of pixels in the image
+    totalPixels = labels.size
+
+    # calculate the percentage of vegetation (green) pixels
+    percentageGreen = counts[vegetationClass] / totalPixels * 100
+    # calculate the percentage of land (red) pixels
+    percentageRed = counts[landClass] / totalPixels * 100
+
+    # calculate the score of the image [score = 10g% + r%]
+    score = (10 * percentageGreen) + percentageRed
+
+    return score
+
+def relevanceGate(im, window = None, threshold = 2.5, rejectFactor = 0.2, workspace = None):
+    # first stage of the evaluation of a picture: the score is estimated by segmenting a thumbnail of 'im' (1/4 of its size),
+    # which takes about 1/16 of the time of the full segmentation
+    # returns (relevant, estimated score, percentage of clouds inside the window)
+    # 'relevant' is False only if the estimated score is clearly below the threshold (below threshold * rejectFactor),
+    # the other pictures have to be segmented at full size to get their real score
+    # 'workspace' is the SegmentationWorkspace used for the thumbnails
+
+    # make the thumbnail
+    height, width = round(im.shape[0] * 0.25), round(im.shape[1] * 0.25)
+    if (workspace is None):
+        workspace = SegmentationWorkspace()
+    workspace.prepare(height, width)
+    thumbnail = cv2.resize(im, (width, height), dst = workspace.image, interpolation = cv2.INTER_AREA)
+
+    # segment it and estimate the score
+    labels = segmentation(thumbnail, window, workspace)
+    counts = classCounts(labels)
+    estimate = evaluate(labels, counts)
+
+    # calculate the percentage of the window covered by clouds (or glaciers)
+    windowPixels = labels.size - counts[outsideClass]
+    clouds = (counts[whiteClass] / windowPixels * 100) if (windowPixels > 0) else 0
+
+    return (estimate >= (threshold * rejectFactor)), estimate, clouds
+
+def cropCircle(scaledIm, im, scalingFactor, window = None):
+    # get the circle of the window in the scaled image, from the tracker if there is one
+    if (window is not None):
+        circle = window.getCircle(scaledIm)
+    else:
+        circle = findCircle(mask(scaledIm))
+
+    # if the circle has been found
+    if (circle is not None):
+        xCentre, yCentre, radius = circle
+        # upscale the circle according to the size of the original image
+        radius /= scalingFactor
+        xCentre /= scalingFactor
+        yCentre /= scalingFactor
+
+        # calculate the size of the circle
+        size = (2 * int(radius), 2 * int(radius))
+
+        # crop the image to fit the circle that has been found
+        im = cv2.getRectSubPix(im, size, (int(xCentre + 5), int(yCentre)))
+    # return the original image object
+    # if it has been cropped, the object itself is the cropped image
+    # otherwise, if it has not been cropped, the image is the same
+    return im
+
+def findCircle(mk):
+    # returns the circle (xCentre, yCentre, radius) that fits the frame of the window in the mask 'mk', or None if there is none
+    height, width = mk.shape
+
+    # find the outer contours of the mask (the holes have already been filled, so the window can only be an outer contour)
+    contours, _ = cv2.findContours(mk, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # start from the biggest contour
+    for contour in sorted(contours, key = cv2.contourArea, reverse = True):
+        # find a circle that fits the contour of the frame of the window
+        (xCentre, yCentre), radius = cv2.minEnclosingCircle(contour)
+        # if the circle is the right size (1/4 height < radius < 2/3 height)
+        if ((radius > (min(height, width) / 4)) and (radius < (min(height, width) / 1.5))):
+            return xCentre, yCentre, radius
+    return None
+
+class WindowTracker:
+    # keeps the geometry of the window of the ISS, which does not move between the pictures
+    # the window is detected with mask() and findCircle() on the first picture, then its mask (for every resolution that is asked)
+    # and its circle are reused, and it is detected again only every 'revalidate' pictures, or when the mean brightness
+    # of the picture changes by more than 'drift' (the camera or the lighting have changed)
+
+    def __init__(self, revalidate = 100, drift = 25):
+        self.revalidate = revalidate # number of pictures after which the window is detected again
+        self.drift = drift # maximum change of the mean brightness [0-255] before the window is detected again
+        self.reset()
+
+    def reset(self):
+        # forget the window, it will be detected again on the next picture
+        self.masks = {} # mask of the window for each resolution (height, width)
+        self.circle = None # circle of the window as fractions of the width of the picture where it was found
+        self.brightness = None # mean brightness of the picture where the window was found
+        self.frames = 0 # number of pictures since the window was found
+
+    def update(self, im):
+        # must be called once for every new picture, before getMask() and getCircle()
+        # returns True if the window has been detected again on this picture
+        brightness = np.mean(cv2.mean(im)[:3])
+        self.frames += 1
+
+        # check if the window has to be detected again
+        if ((self.brightness is not None) and (self.circle is not None) and (self.frames < self.revalidate) and (abs(brightness - self.brightness) <= self.drift)):
+            return False
+
+        # detect the window on this picture
+        mk = mask(im)
+        circle = findCircle(mk)
+        height, width = mk.shape
+        self.masks = {(height, width): mk}
+        self.circle = None if (circle is None) else tuple(value / width for value in circle)
+        self.brightness = brightness
+        self.frames = 0
+        return True
+
+    def getMask(self, im):
+        # returns the mask of the window for the resolution of the picture 'im'
+        height, width = im.shape[:2]
+
+        # if the window has never been detected, detect it now
+        if (not self.masks):
+            self.update(im)
+
+        if ((height, width) not in self.masks):
+            # scale the mask that was detected to the new resolution, and keep it for the next pictures
+            mk = next(iter(self.masks.values()))
+            self.masks[(height, width)] = cv2.resize(mk, (width, height), interpolation = cv2.INTER_NEAREST)
+        return self.masks[(height, width)]
+
+    def getCircle(self, im):
+        # returns the circle (xCentre, yCentre, radius) of the window in the pixels of the picture 'im', or None if it was not found
+        if (not self.masks):
+            self.update(im)
+
+        if (self.circle is None):
+            return None
+        width = im.shape[1]
+        return tuple(value * width for value in self.circle)
+
+def colourise(labels):
+    # turns the label map into a BGR image where every class has its colour (only needed to look at the result)
+    # colour classes:
+    #   glaciers + clouds: white
+    #   water: blue
+    #   vegetation: green
+    #   other: red
+    return palette[labels]
+
+def mask(im):
+    # the mask is made of the pixels that become white after drastically increasing the contrast (x2) and the brightness (x100) of the image
+    # both enhancements only depend on the value of each channel, so they are combined into a single lookup table
+    # that directly tells whether each channel becomes 255
+    lut = enhance.brightnessLut(100)[enhance.contrastLut(enhance.greyMean(im), 1 + 100 / 100)]
+    lut = np.where(lut == 255, 255, 0).astype(np.uint8)
+
+    # apply it to the image and keep only the pixels that are white in every channel
+    b, g, r = cv2.split(cv2.LUT(im, lut))
+    grey = cv2.bitwise_and(cv2.bitwise_and(b, g), r)
+
+    # fill up any holes in the mask
+    grey = fill(grey)
+
+    return grey
+
+def fill(im, dst = None, floodMask = None):
+    # fills the holes of the 0/255 mask 'im': the black areas that cannot be reached from the top-left and bottom-right corners
+    # the result is written into 'dst', which can also be 'im' itself
+    # 'floodMask' can be a preallocated image two pixels bigger than 'im', to avoid allocating a new one
+
+    # make a slightly bigger mask (two pixels), empty
+    if (floodMask is None):
+        floodMask = np.zeros((im.shape[0] + 2, im.shape[1] + 2), dtype = np.uint8)
+    else:
+        floodMask.fill(0)
+
+    # fill the mask (and not the image) from the top-left and bottom-right corners, with 4-connectivity and the value 255
+    flags = 4 | cv2.FLOODFILL_MASK_ONLY | (255 << 8)
+    cv2.floodFill(im, floodMask, (0, 0), 255, 0, 0, flags)
+    cv2.floodFill(im, floodMask, (im.shape[1] - 1, im.shape[0] - 1), 255, 0, 0, flags)
+
+    # invert it (it is all white except the parts that have been filled)
+    filled = floodMask[1:-1, 1:-1]
+    cv2.bitwise_not(filled, dst = filled)
+
+    # add it to the image to fill up any black patches
+    return cv2.bitwise_or(im, filled, dst = dst)
+
+def contrast(im, k = 75):
+    # increases the contrast of the BGR image 'im' by k%. The default contrast value is 75
+    # this gives the same result as PIL's ImageEnhance.Contrast, without converting the image
+    return enhance.contrast(im, 1 + k / 100)
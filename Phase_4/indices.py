@@ -0,0 +1,49 @@
+import numpy as np
+
+# normalised difference indexes with lookup tables
+# NDVI = (NIR - red) / (NIR + red) and NDWI = (green - NIR) / (green + NIR) are both normalised differences (a - b) / (a + b)
+# of two 8-bit channels, so every possible value fits in a 256x256 table: the index of a whole picture is read from the table
+# at the position of each pair of pixels (a, b), without dividing any pixel and without float copies of the channels
+# the blue channel of the camera contains the infrared (NIR) value
+
+# all the possible values of a pixel
+levels = np.arange(256, dtype = np.float32)
+
+def indexTable(epsilon = 0):
+    # returns the table of the index (a - b) / (a + b + epsilon) for every pair (a, b), computed in float32
+    # (the row is 'a' and the column is 'b'), where the index is 0 when both values are 0
+    # a small 'epsilon' can be added to every denominator, like createdataset.py does, to get exactly the same values
+    num = levels[:, None] - levels[None, :]
+    den = levels[:, None] + levels[None, :]
+    table = np.zeros((256, 256), dtype = np.float32)
+    np.divide(num, den + np.float32(epsilon), out = table, where = (den > 0))
+    return table
+
+# value of the index for every pair (a, b)
+values = indexTable()
+
+def byteTable(scale = 255):
+    # returns the table of the index multiplied by 'scale' and converted to 8 bits (fixed point), like 'ndvi * 255' followed by
+    # 'astype(np.uint8)' in the first scripts: the values are truncated, and the negative ones wrap around
+    return (values * scale).astype(np.int16).astype(np.uint8)
+
+def pairIndex(a, b, pairs = None):
+    # returns the position of each pair of pixels in the tables: a * 256 + b
+    # 'pairs' can be a preallocated uint16 or intp image of the same size, to avoid allocating a new one
+    # (np.take converts the positions to intp, so an intp image is not copied by normalisedDifference())
+    pairs = np.multiply(a, 256, out = pairs, dtype = np.uint16 if (pairs is None) else pairs.dtype)
+    return np.add(pairs, b, out = pairs)
+
+def normalisedDifference(a, b, table = values, dst = None, pairs = None):
+    # returns the index (a - b) / (a + b) of the single channel 8-bit images 'a' and 'b', read from 'table' (float32 by default)
+    # 'dst' (same type as the table) and 'pairs' (uint16, or intp so that no copy is made) can be preallocated images of the same size
+    # all the positions are inside the table, so they don't need to be checked
+    return np.take(table.ravel(), pairIndex(a, b, pairs), out = dst, mode = "clip")
+
+def ndvi(im, table = values, dst = None, pairs = None):
+    # returns the NDVI of the BGR image 'im': (NIR - red) / (NIR + red)
+    return normalisedDifference(im[:, :, 0], im[:, :, 2], table, dst, pairs)
+
+def ndwi(im, table = values, dst = None, pairs = None):
+    # returns the NDWI of the BGR image 'im': (green - NIR) / (green + NIR)
+    return normalisedDifference(im[:, :, 1], im[:, :, 0], table, dst, pairs)